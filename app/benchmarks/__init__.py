@@ -0,0 +1 @@
+'''benchmarks of the recipe api, run through management commands'''
@@ -0,0 +1,320 @@
+'''end to end load benchmark of the api routes
+
+A workload is a list of plain request tuples generated up front from a
+seeded random mix, so the in-process client and the HTTP driver replay
+exactly the same requests and results of two commits can be compared.
+'''
+import http.client
+import json
+import math
+import multiprocessing
+import time
+from collections import defaultdict
+from functools import lru_cache
+from io import BytesIO
+from urllib.parse import urlencode, urlsplit
+
+from django.db import connection
+from django.test import Client
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.urls import reverse
+from PIL import Image
+
+
+JSON_CONTENT = 'application/json'
+# endpoint name: relative weight in the default mix
+DEFAULT_MIX = {
+    'recipe-list': 30,
+    'recipe-page': 15,
+    'recipe-filter': 10,
+    'recipe-search': 10,
+    'recipe-detail': 15,
+    'recipe-create': 3,
+    'recipe-upload-image': 1,
+    'tag-list': 5,
+    'tag-typeahead': 5,
+    'ingredient-list': 5,
+    'token': 1,
+}
+
+
+@lru_cache(maxsize=None)
+def _image():
+    out = BytesIO()
+    Image.new('RGB', (64, 64), (200, 120, 40)).save(out, format='JPEG')
+    return out.getvalue()
+
+
+def _get(path, **params):
+    if params:
+        path = f'{path}?{urlencode(params)}'
+    return 'GET', path, None, None
+
+
+def _post_json(path, data):
+    return 'POST', path, json.dumps(data).encode(), JSON_CONTENT
+
+
+def _recipe_list(user, rng):
+    return _get(reverse('recipe:recipe-list'))
+
+
+def _recipe_page(user, rng):
+    return _get(reverse('recipe:recipe-list'), page_size=20)
+
+
+def _recipe_filter(user, rng):
+    tag_ids = [tag_id for tag_id, _ in rng.sample(
+        user['tags'], min(2, len(user['tags']))
+    )]
+    return _get(
+        reverse('recipe:recipe-list'),
+        tags=','.join(map(str, tag_ids)), page_size=20,
+    )
+
+
+def _recipe_search(user, rng):
+    _, name = rng.choice(user['ingredients'])
+    return _get(
+        reverse('recipe:recipe-list'),
+        search=name.split()[-1], page_size=20,
+    )
+
+
+def _recipe_detail(user, rng):
+    return _get(reverse('recipe:recipe-detail', args=[
+        rng.choice(user['recipes'])
+    ]))
+
+
+def _recipe_create(user, rng):
+    return _post_json(reverse('recipe:recipe-list'), {
+        'title': f'Benchmark recipe {rng.randrange(10 ** 6)}',
+        'time_minutes': rng.randint(5, 120),
+        'price': f'{rng.randint(100, 5000) / 100:.2f}',
+        'tags': [{'name': name} for _, name in rng.sample(
+            user['tags'], min(2, len(user['tags']))
+        )],
+        'ingredients': [{'name': name} for _, name in rng.sample(
+            user['ingredients'], min(4, len(user['ingredients']))
+        )],
+    })
+
+
+def _recipe_upload_image(user, rng):
+    path = reverse(
+        'recipe:recipe-upload-image', args=[rng.choice(user['recipes'])]
+    )
+    image = BytesIO(_image())
+    image.name = 'benchmark.jpg'
+    return (
+        'POST', path, encode_multipart(BOUNDARY, {'image': image}),
+        MULTIPART_CONTENT,
+    )
+
+
+def _tag_list(user, rng):
+    return _get(reverse('recipe:tag-list'))
+
+
+def _tag_typeahead(user, rng):
+    _, name = rng.choice(user['tags'])
+    return _get(reverse('recipe:tag-list'), q=name[:3])
+
+
+def _ingredient_list(user, rng):
+    return _get(reverse('recipe:ingredient-list'))
+
+
+def _token(user, rng):
+    return _post_json(reverse('user:token'), {
+        'email': user['email'], 'password': user['password'],
+    })
+
+
+ENDPOINTS = {
+    'recipe-list': _recipe_list,
+    'recipe-page': _recipe_page,
+    'recipe-filter': _recipe_filter,
+    'recipe-search': _recipe_search,
+    'recipe-detail': _recipe_detail,
+    'recipe-create': _recipe_create,
+    'recipe-upload-image': _recipe_upload_image,
+    'tag-list': _tag_list,
+    'tag-typeahead': _tag_typeahead,
+    'ingredient-list': _ingredient_list,
+    'token': _token,
+}
+# sent without the Authorization header
+ANONYMOUS = {'token'}
+
+
+def parse_mix(value):
+    '''parse name=weight,... into a mix, raising ValueError'''
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name not in ENDPOINTS:
+            raise ValueError(
+                f'unknown endpoint {name}, choose from {", ".join(ENDPOINTS)}'
+            )
+        mix[name] = float(weight or 1)
+        if not (math.isfinite(mix[name]) and mix[name] >= 0):
+            raise ValueError(f'invalid weight for {name}')
+    if sum(mix.values()) <= 0:
+        raise ValueError('the weights must add up to more than 0')
+    return mix
+
+
+def build_workload(users, mix, count, rng):
+    '''draw count (endpoint, method, path, body, content type, token)'''
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    workload = []
+    for name in rng.choices(names, weights=weights, k=count):
+        user = rng.choice(users)
+        method, path, body, content_type = ENDPOINTS[name](user, rng)
+        token = None if name in ANONYMOUS else user['token']
+        workload.append((name, method, path, body, content_type, token))
+    return workload
+
+
+class QueryCounter:
+    '''execute wrapper counting the queries run through a connection'''
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def run_client(workload):
+    '''replay the workload through the Django test client in process
+
+    Returns (endpoint, seconds, status, queries) samples.
+    '''
+    # the default testserver host is not in ALLOWED_HOSTS outside tests
+    client = Client(SERVER_NAME='localhost')
+    counter = QueryCounter()
+    samples = []
+    with connection.execute_wrapper(counter):
+        for name, method, path, body, content_type, token in workload:
+            headers = {}
+            if token:
+                headers['HTTP_AUTHORIZATION'] = f'Token {token}'
+            counter.count = 0
+            start = time.perf_counter()
+            response = client.generic(
+                method, path, body or b'',
+                content_type or 'application/octet-stream', **headers
+            )
+            elapsed = time.perf_counter() - start
+            samples.append(
+                (name, elapsed, response.status_code, counter.count)
+            )
+    return samples
+
+
+def _http_worker(args):
+    '''replay requests over one keep-alive connection'''
+    base_url, workload = args
+    url = urlsplit(base_url)
+    prefix = url.path.rstrip('/')
+    conn = http.client.HTTPConnection(url.hostname, url.port, timeout=60)
+    samples = []
+    for name, method, path, body, content_type, token in workload:
+        headers = {}
+        if token:
+            headers['Authorization'] = f'Token {token}'
+        if content_type:
+            headers['Content-Type'] = content_type
+        start = time.perf_counter()
+        try:
+            conn.request(method, prefix + path, body, headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            status = 0
+        samples.append((name, time.perf_counter() - start, status, None))
+    conn.close()
+    return samples
+
+
+def run_http(base_url, workload, processes):
+    '''replay the workload against a running server from processes
+
+    Returns the samples and the wall clock seconds taken.
+    '''
+    shares = [(base_url, workload[i::processes]) for i in range(processes)]
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(_http_worker, shares)
+    wall = time.perf_counter() - start
+    return [sample for samples in results for sample in samples], wall
+
+
+def percentile(values, pct):
+    '''nearest rank percentile of sorted values'''
+    if not values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def _summary(samples, wall):
+    latencies = sorted(sample[1] for sample in samples)
+    queries = [sample[3] for sample in samples if sample[3] is not None]
+    return {
+        'requests': len(samples),
+        # status 0 is a connection error of the HTTP driver
+        'errors': sum(
+            1 for sample in samples if not 200 <= sample[2] < 400
+        ),
+        'p50_ms': _ms(percentile(latencies, 50)),
+        'p95_ms': _ms(percentile(latencies, 95)),
+        'p99_ms': _ms(percentile(latencies, 99)),
+        'mean_ms': (
+            _ms(sum(latencies) / len(latencies)) if latencies else None
+        ),
+        'throughput_rps': round(len(samples) / wall, 3) if wall else None,
+        'queries_per_request': (
+            round(sum(queries) / len(queries), 3) if queries else None
+        ),
+    }
+
+
+def summarize(samples, wall):
+    '''latency percentiles, throughput and queries per endpoint'''
+    by_endpoint = defaultdict(list)
+    for sample in samples:
+        by_endpoint[sample[0]].append(sample)
+    return {
+        'endpoints': {
+            name: _summary(by_endpoint[name], wall)
+            for name in sorted(by_endpoint)
+        },
+        'total': _summary(samples, wall),
+    }
+
+
+def compare(old, new, metric='p95_ms'):
+    '''yield (endpoint, old, new, change in percent) of a metric'''
+    rows = [
+        (name, old['endpoints'][name], new['endpoints'][name])
+        for name in sorted(new['endpoints'])
+        if name in old['endpoints']
+    ] + [('total', old['total'], new['total'])]
+    for name, before, after in rows:
+        before, after = before.get(metric), after.get(metric)
+        change = None
+        if before and after is not None:
+            change = round((after - before) / before * 100, 1)
+        yield name, before, after, change
@@ -0,0 +1,264 @@
+'''micro benchmarks of the serializers and queryset builders
+
+Every case sets up and returns the function to benchmark, which is timed
+with timeit in batches; a separate pass under tracemalloc records the peak
+memory a single call allocates. Cases touching the database run in a
+transaction the runner rolls back.
+'''
+import gc
+import math
+import os
+import timeit
+import tracemalloc
+from decimal import Decimal
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import Recipe, Tag, Ingredient, recipe_image_file_path
+from recipe.serializers import RecipeRowsSerializer, RecipeSerializer
+from recipe.views import RecipeViewSet
+
+
+# per call results the bench_micro command compares against
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+BENCH_EMAIL = 'micro-benchmark@example.com'
+# peaks this far over the baseline are within noise however small it is
+ALLOC_SLACK = 1024
+
+
+def _user():
+    user, _ = get_user_model().objects.get_or_create(email=BENCH_EMAIL)
+    return user
+
+
+def _host():
+    '''a host the request may build absolute image urls with'''
+    # DEBUG allows localhost when ALLOWED_HOSTS is empty
+    return next((
+        host for host in settings.ALLOWED_HOSTS
+        if host != '*' and not host.startswith('.')
+    ), 'localhost')
+
+
+def _request(user, params=None):
+    request = Request(APIRequestFactory().get(
+        '/api/recipe/recipes/', params, SERVER_NAME=_host()
+    ))
+    request.user = user
+    return request
+
+
+def _prefetched(model, objs):
+    '''queryset holding objs as if prefetched'''
+    queryset = model.objects.all()
+    queryset._result_cache = objs
+    queryset._prefetch_done = True
+    return queryset
+
+
+def _to_representation(count):
+    '''serialize count recipes with prefetched relations, no queries'''
+    tags = [Tag(id=i, name=f'tag {i}') for i in range(1, 4)]
+    ingredients = [
+        Ingredient(id=i, name=f'ingredient {i}') for i in range(1, 7)
+    ]
+    recipes = []
+    for i in range(1, count + 1):
+        recipe = Recipe(
+            id=i, title=f'recipe {i}', time_minutes=i % 90 + 1,
+            price=Decimal('5.25'), link='https://example.com/recipe',
+            image=f'uploads/recipe/{i}.jpg' if i % 2 else None,
+        )
+        recipe._prefetched_objects_cache = {
+            'tags': _prefetched(Tag, tags),
+            'ingredients': _prefetched(Ingredient, ingredients),
+        }
+        recipes.append(recipe)
+    return lambda: RecipeSerializer(recipes, many=True).data
+
+
+def _rows(count):
+    '''serialize count list rows, loading their relations by query'''
+    user = _user()
+    # names unique to the case, cases share the transaction
+    tags = Tag.objects.bulk_create(
+        [Tag(user=user, name=f'rows {count} tag {i}') for i in range(3)]
+    )
+    ingredients = Ingredient.objects.bulk_create([
+        Ingredient(user=user, name=f'rows {count} ingredient {i}')
+        for i in range(6)
+    ])
+    recipes = Recipe.objects.bulk_create([
+        Recipe(
+            user=user, title=f'recipe {i}', time_minutes=i % 90 + 1,
+            price=Decimal('5.25'), link='https://example.com/recipe',
+            image=f'uploads/recipe/{i}.jpg' if i % 2 else '',
+        )
+        for i in range(1, count + 1)
+    ], batch_size=1000)
+    for field, objs in [('tag', tags), ('ingredient', ingredients)]:
+        through = getattr(Recipe, f'{field}s').through
+        through.objects.bulk_create([
+            through(recipe_id=recipe.id, **{f'{field}_id': obj.id})
+            for recipe in recipes for obj in objs
+        ], batch_size=5000)
+    rows = list(
+        Recipe.objects.filter(pk__in=[recipe.id for recipe in recipes])
+        .order_by('id')
+        .values('id', 'title', 'time_minutes', 'price', 'link', 'image')
+    )
+    context = {'request': _request(user)}
+    return lambda: RecipeRowsSerializer(rows, context=context).data
+
+
+def _payload(count):
+    return {
+        'title': 'Benchmark recipe',
+        'time_minutes': 30,
+        'price': '12.50',
+        'tags': [{'name': f'bench tag {i}'} for i in range(count)],
+        'ingredients': [
+            {'name': f'bench ingredient {i}'} for i in range(count)
+        ],
+    }
+
+
+def _create(count):
+    '''create a recipe naming count existing tags and ingredients'''
+    user = _user()
+    context = {'request': _request(user)}
+    payload = _payload(count)
+
+    def create():
+        serializer = RecipeSerializer(data=payload, context=context)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=user)
+    return create
+
+
+def _update(count):
+    '''replace the tags and ingredients of a recipe with count others'''
+    user = _user()
+    context = {'request': _request(user)}
+    recipe = Recipe.objects.create(
+        user=user, title='Benchmark recipe', time_minutes=30,
+        price=Decimal('12.50'),
+    )
+    payloads = [_payload(count), _payload(0)]
+
+    def update():
+        for payload in payloads:
+            serializer = RecipeSerializer(
+                recipe, data=payload, context=context
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+    return update
+
+
+def _get_queryset(params):
+    '''build and compile the list queryset for query params'''
+    user = _user()
+
+    def get_queryset():
+        view = RecipeViewSet(
+            action='list', request=_request(user, params), format_kwarg=None
+        )
+        queryset = view.get_queryset()
+        queryset.query.get_compiler(using=queryset.db).as_sql()
+    return get_queryset
+
+
+def _image_file_path():
+    '''name a new recipe image'''
+    return partial(recipe_image_file_path, None, 'photo.jpg')
+
+
+# name: setup returning the function to benchmark
+CASES = {
+    'to_representation[1]': partial(_to_representation, 1),
+    'to_representation[100]': partial(_to_representation, 100),
+    'to_representation[10000]': partial(_to_representation, 10000),
+    'rows[1]': partial(_rows, 1),
+    'rows[100]': partial(_rows, 100),
+    'rows[10000]': partial(_rows, 10000),
+    'create[tags=0]': partial(_create, 0),
+    'create[tags=5]': partial(_create, 5),
+    'create[tags=20]': partial(_create, 20),
+    'update[tags=5]': partial(_update, 5),
+    'update[tags=20]': partial(_update, 20),
+    'get_queryset[plain]': partial(_get_queryset, {}),
+    'get_queryset[tags]': partial(_get_queryset, {'tags': '1,2,3'}),
+    'get_queryset[tags+ingredients]': partial(_get_queryset, {
+        'tags': '1,2', 'ingredients': '3,4', 'match': 'all',
+    }),
+    'get_queryset[search+have+sort]': partial(_get_queryset, {
+        'search': 'curry', 'have': '1,2,3', 'ordering': 'price',
+        'max_price': '20', 'fields': 'id,title',
+    }),
+    'recipe_image_file_path': _image_file_path,
+}
+
+
+def measure(func, min_time=0.2, repeat=5):
+    '''best and median seconds per call, and peak bytes one call allocates'''
+    func()
+    timer = timeit.Timer(func)
+    per_call = timer.timeit(1)
+    # batches long enough for the clock, timed with gc disabled
+    number = max(1, math.ceil(min_time / repeat / max(per_call, 1e-9)))
+    times = sorted(
+        elapsed / number for elapsed in timer.repeat(repeat, number)
+    )
+    peaks = []
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for _ in range(repeat):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            func()
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return {
+        'time_us': round(times[0] * 1e6, 3),
+        'median_us': round(times[len(times) // 2] * 1e6, 3),
+        'peak_bytes': min(peaks),
+        'number': number,
+    }
+
+
+def run(names, min_time=0.2, repeat=5):
+    '''measure the named cases, rolling back what they write'''
+    results = {}
+    with transaction.atomic():
+        for name in names:
+            results[name] = measure(CASES[name](), min_time, repeat)
+        transaction.set_rollback(True)
+    return results
+
+
+def regressions(results, baseline, tolerance, alloc_tolerance):
+    '''yield a message per case slower or hungrier than its baseline'''
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        limit = base['time_us'] * (1 + tolerance)
+        if result['time_us'] > limit:
+            yield (
+                f"{name}: {result['time_us']} us per call, baseline "
+                f"{base['time_us']} us +{tolerance:.0%}"
+            )
+        limit = base['peak_bytes'] * (1 + alloc_tolerance) + ALLOC_SLACK
+        if result['peak_bytes'] > limit:
+            yield (
+                f"{name}: {result['peak_bytes']} bytes peak per call, "
+                f"baseline {base['peak_bytes']} bytes +{alloc_tolerance:.0%}"
+            )
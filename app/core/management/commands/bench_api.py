@@ -0,0 +1,172 @@
+import json
+import platform
+import random
+import subprocess
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from benchmarks.load import (
+    DEFAULT_MIX,
+    build_workload,
+    compare,
+    parse_mix,
+    run_client,
+    run_http,
+    summarize,
+)
+
+
+def git_commit():
+    '''commit of the working tree, None outside a git checkout'''
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'replay a seeded mix of api requests as users created by '
+        'seed_recipes and report latency percentiles per endpoint'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--driver', choices=['client', 'http'],
+                            default='client',
+                            help='in process test client, or HTTP '
+                                 'requests against --url')
+        parser.add_argument('--url', default='http://127.0.0.1:8000',
+                            help='server of the http driver')
+        parser.add_argument('--processes', type=int, default=4,
+                            help='concurrent processes of the http driver')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--warmup', type=int, default=50,
+                            help='requests sent first and not measured')
+        parser.add_argument('--mix',
+                            help='endpoint=weight,... defaults to ' +
+                                 ','.join(f'{name}={weight}' for name, weight
+                                          in DEFAULT_MIX.items()))
+        parser.add_argument('--users', type=int, default=10,
+                            help='seeded users to spread requests over')
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument('--password', default='seed-password')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='write the results as JSON')
+        parser.add_argument('--compare',
+                            help='JSON results to report p95 changes against')
+
+    def _users(self, options):
+        '''tokens and sample ids of the seeded users'''
+        users = get_user_model().objects.filter(
+            email__startswith=f"{options['prefix']}-"
+        ).order_by('id')[:options['users']]
+        loaded = []
+        for user in users:
+            recipes = list(user.recipe_set.order_by('id').values_list(
+                'id', flat=True
+            )[:100])
+            tags = list(user.tag_set.order_by('id').values_list(
+                'id', 'name'
+            )[:100])
+            ingredients = list(user.ingredient_set.order_by('id').values_list(
+                'id', 'name'
+            )[:100])
+            if not (recipes and tags and ingredients):
+                continue
+            loaded.append({
+                'email': user.email,
+                'password': options['password'],
+                'token': Token.objects.get_or_create(user=user)[0].key,
+                'recipes': recipes,
+                'tags': tags,
+                'ingredients': ingredients,
+            })
+        if not loaded:
+            raise CommandError(
+                f"no users {options['prefix']}-* with recipes, tags and "
+                f"ingredients, run seed_recipes first"
+            )
+        return loaded
+
+    def _run(self, options, workload):
+        if options['driver'] == 'http':
+            return run_http(options['url'], workload, options['processes'])
+        start = time.perf_counter()
+        samples = run_client(workload)
+        return samples, time.perf_counter() - start
+
+    def handle(self, *args, **options):
+        for name in ['requests', 'processes', 'users']:
+            if options[name] < 1:
+                raise CommandError(f'--{name} must be >= 1')
+        if options['warmup'] < 0:
+            raise CommandError('--warmup must be >= 0')
+        mix = DEFAULT_MIX
+        if options['mix']:
+            try:
+                mix = parse_mix(options['mix'])
+            except ValueError as exc:
+                raise CommandError(str(exc))
+        rng = random.Random(options['seed'])
+        users = self._users(options)
+        warmup = build_workload(users, mix, options['warmup'], rng)
+        workload = build_workload(users, mix, options['requests'], rng)
+
+        self._run(options, warmup)
+        samples, wall = self._run(options, workload)
+        results = summarize(samples, wall)
+        results['meta'] = {
+            'commit': git_commit(),
+            'driver': options['driver'],
+            'processes': (
+                options['processes'] if options['driver'] == 'http' else 1
+            ),
+            'requests': options['requests'],
+            'warmup': options['warmup'],
+            'seed': options['seed'],
+            'users': len(users),
+            'mix': mix,
+            'debug': settings.DEBUG,
+            'python': platform.python_version(),
+        }
+
+        self._report(results)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+                f.write('\n')
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            self.stdout.write('p95 ms: before -> after')
+            for name, before, after, change in compare(baseline, results):
+                change = '' if change is None else f' ({change:+}%)'
+                self.stdout.write(f'{name:22} {before} -> {after}{change}')
+
+    def _report(self, results):
+        rows = list(results['endpoints'].items())
+        rows.append(('total', results['total']))
+        self.stdout.write(
+            f"{'endpoint':22}{'n':>7}{'err':>5}{'p50':>9}{'p95':>9}"
+            f"{'p99':>9}{'rps':>9}{'queries':>9}"
+        )
+        for name, row in rows:
+            cells = ''.join(
+                f"{'-' if row[key] is None else row[key]:>9}"
+                for key in ['p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps',
+                            'queries_per_request']
+            )
+            self.stdout.write(
+                f"{name:22}{row['requests']:>7}{row['errors']:>5}{cells}"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{results['total']['requests']} requests, "
+            f"{results['total']['throughput_rps']} per second"
+        ))
@@ -0,0 +1,82 @@
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.micro import BASELINE_PATH, CASES, regressions, run
+
+
+class Command(BaseCommand):
+    help = (
+        'time serializers and queryset builders per call, with the peak '
+        'memory they allocate, and fail on regressions against a baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('cases', nargs='*',
+                            help='substrings of the case names to run, '
+                                 'all by default')
+        parser.add_argument('--baseline', default=BASELINE_PATH)
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='store the results as the new baseline')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='allowed slowdown per call, 0.25 is 25%%')
+        parser.add_argument('--alloc-tolerance', type=float, default=0.10,
+                            help='allowed growth of the peak allocation')
+        parser.add_argument('--min-time', type=float, default=0.2,
+                            help='seconds to spend timing each case')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--output', help='write the results as JSON')
+
+    def handle(self, *args, **options):
+        names = [
+            name for name in CASES
+            if not options['cases'] or
+            any(case in name for case in options['cases'])
+        ]
+        if not names:
+            raise CommandError(
+                f"no case matches, choose from {', '.join(CASES)}"
+            )
+        results = run(names, options['min_time'], options['repeat'])
+
+        baseline = {}
+        if os.path.exists(options['baseline']):
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+        self.stdout.write(
+            f"{'case':34}{'us/call':>12}{'median':>12}{'peak B':>10}"
+            f"{'baseline':>12}"
+        )
+        for name, result in results.items():
+            base = baseline.get(name, {}).get('time_us', '-')
+            self.stdout.write(
+                f"{name:34}{result['time_us']:>12}{result['median_us']:>12}"
+                f"{result['peak_bytes']:>10}{base:>12}"
+            )
+
+        if options['output']:
+            self._write(options['output'], results)
+        if options['update_baseline']:
+            self._write(options['baseline'], {**baseline, **results})
+            self.stdout.write(self.style.SUCCESS(
+                f"stored {len(results)} cases in {options['baseline']}"
+            ))
+            return
+
+        failures = list(regressions(
+            results, baseline,
+            options['tolerance'], options['alloc_tolerance'],
+        ))
+        if failures:
+            raise CommandError(
+                'regressions against the baseline:\n' + '\n'.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(results)} cases within the baseline'
+        ))
+
+    def _write(self, path, results):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
@@ -0,0 +1,145 @@
+import os
+import posixpath
+from collections import Counter
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import ImageJob, ImageUpload, ImageUploadChunk, Recipe
+from recipe.images import STAGING_DIR, run_job, set_image_status
+from recipe.uploads import PARTIAL_DIR, discard_upload
+
+
+RECIPE_IMAGE_DIR = posixpath.join('uploads', 'recipe')
+# image jobs failing this often are given up rather than retried again
+MAX_IMAGE_JOB_ATTEMPTS = 3
+
+
+def walk(storage, path):
+    '''yield the names of all files below path'''
+    try:
+        dirs, files = storage.listdir(path)
+    except FileNotFoundError:
+        return
+    for name in files:
+        yield posixpath.join(path, name)
+    for name in dirs:
+        yield from walk(storage, posixpath.join(path, name))
+
+
+class Command(BaseCommand):
+    help = 'delete recipe image files no recipe or upload refers to'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='only report what would be deleted')
+        parser.add_argument('--grace-minutes', type=int, default=60,
+                            help='keep files modified and image jobs '
+                                 'queued more recently')
+        parser.add_argument('--upload-max-age-hours', type=int, default=24,
+                            help='discard resumable uploads idle longer')
+
+    def _referenced(self):
+        '''count recipes per stored image'''
+        return Counter(
+            Recipe.objects.exclude(image='').exclude(image__isnull=True)
+            .values_list('image', flat=True).iterator()
+        )
+
+    def _orphans(self, image_storage, refs):
+        '''yield (storage, name) of files nothing refers to'''
+        stems = {os.path.splitext(name)[0] for name in refs}
+        for name in walk(image_storage, RECIPE_IMAGE_DIR):
+            stem = os.path.splitext(name)[0]
+            # thumbnails and renditions are named <stem>_<suffix>
+            if stem not in stems and stem.rsplit('_', 1)[0] not in stems:
+                yield image_storage, name
+        # staged files are removed by the image workers once processed
+        queued = set(ImageJob.objects.values_list('staged_name', flat=True))
+        for name in walk(default_storage, STAGING_DIR):
+            if name not in queued:
+                yield default_storage, name
+        chunks = set(
+            ImageUploadChunk.objects.values_list('name', flat=True)
+        )
+        for name in walk(default_storage, PARTIAL_DIR):
+            if name not in chunks:
+                yield default_storage, name
+
+    def _abandoned_jobs(self, cutoff, dry_run):
+        '''retry image jobs a restart lost, give up on failing ones
+
+        Returns the number of jobs retried and of recipes marked failed.
+        '''
+        retried = failed = 0
+        for job in list(ImageJob.objects.filter(updated_at__lt=cutoff)):
+            if (job.attempts < MAX_IMAGE_JOB_ATTEMPTS and
+                    default_storage.exists(job.staged_name)):
+                retried += 1
+                if not dry_run:
+                    run_job(job.pk)
+                continue
+            failed += 1
+            if not dry_run:
+                set_image_status(job.recipe_id, Recipe.IMAGE_FAILED)
+                job.delete()
+        # statuses left by jobs queued before they were stored
+        jobless = Recipe.objects.filter(
+            image_status__in=[Recipe.IMAGE_PENDING, Recipe.IMAGE_PROCESSING],
+            updated_at__lt=cutoff,
+            image_jobs__isnull=True,
+        )
+        if dry_run:
+            failed += jobless.count()
+        else:
+            failed += jobless.update(
+                image_status=Recipe.IMAGE_FAILED, updated_at=timezone.now()
+            )
+        return retried, failed
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        now = timezone.now()
+
+        stale = ImageUpload.objects.filter(
+            updated_at__lt=now - timedelta(
+                hours=options['upload_max_age_hours']
+            )
+        )
+        stale_count = 0
+        for upload in stale.iterator():
+            stale_count += 1
+            if not dry_run:
+                discard_upload(upload)
+
+        cutoff = now - timedelta(minutes=options['grace_minutes'])
+        retried, failed = self._abandoned_jobs(cutoff, dry_run)
+
+        refs = self._referenced()
+        image_storage = Recipe._meta.get_field('image').storage
+        deleted = freed = 0
+        for storage, name in self._orphans(image_storage, refs):
+            if storage.get_modified_time(name) >= cutoff:
+                continue
+            deleted += 1
+            freed += storage.size(name)
+            if not dry_run:
+                storage.delete(name)
+            if options['verbosity'] > 1:
+                self.stdout.write(name)
+
+        shared = sum(1 for count in refs.values() if count > 1)
+        verb = 'would delete' if dry_run else 'deleted'
+        retry_verb, fail_verb = (
+            ('would retry', 'would fail') if dry_run else ('retried', 'failed')
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'{verb} {deleted} files ({freed} bytes) and '
+                f'{stale_count} stale uploads, {retry_verb} {retried} '
+                f'and {fail_verb} {failed} abandoned image jobs, '
+                f'{shared} images are shared by several recipes'
+            )
+        )
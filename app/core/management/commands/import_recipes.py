@@ -0,0 +1,51 @@
+import argparse
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.importers import DEFAULT_CHUNK_SIZE, RecipeImporter
+
+
+def positive_int(value):
+    '''argparse type of integers of at least 1'''
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'{value} is not >= 1')
+    return number
+
+
+class Command(BaseCommand):
+    help = 'import recipes for a user from a JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='NDJSON file, or - for stdin')
+        parser.add_argument('--email', required=True,
+                            help='email of the user owning the recipes')
+        parser.add_argument('--chunk-size', type=positive_int,
+                            default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"no user with email {options['email']}")
+
+        importer = RecipeImporter(user, chunk_size=options['chunk_size'])
+        if options['path'] == '-':
+            report = importer.run(sys.stdin.buffer)
+        else:
+            try:
+                lines = open(options['path'], 'rb')
+            except OSError as exc:
+                raise CommandError(
+                    f"cannot read {options['path']}: {exc.strerror}"
+                )
+            with lines:
+                report = importer.run(lines)
+
+        for error in report['errors']:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        self.stdout.write(
+            self.style.SUCCESS(f"imported {report['created']} recipes")
+        )
@@ -0,0 +1,351 @@
+import io
+import random
+from decimal import Decimal
+from functools import lru_cache
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from core.models import Recipe, Tag, Ingredient, recipe_image_file_path
+from recipe.images import THUMBNAIL_SIZE, thumbnail_name
+from recipe.search import update_search_vectors
+
+
+ADJECTIVES = [
+    'Spicy', 'Creamy', 'Smoky', 'Crispy', 'Roasted', 'Grilled', 'Slow',
+    'Quick', 'Lemony', 'Herby', 'Garlicky', 'Sweet', 'Tangy', 'Rustic',
+    'Classic', 'Golden', 'Hearty', 'Light', 'Fiery', 'Braised',
+]
+DISHES = [
+    'Curry', 'Stew', 'Soup', 'Salad', 'Pasta', 'Risotto', 'Tacos', 'Pie',
+    'Noodles', 'Chili', 'Omelette', 'Pancakes', 'Bread', 'Burger', 'Tart',
+    'Gratin', 'Skewers', 'Dumplings', 'Casserole', 'Bowl',
+]
+INGREDIENTS = [
+    'Salt', 'Pepper', 'Garlic', 'Onion', 'Tomato', 'Basil', 'Butter',
+    'Flour', 'Egg', 'Milk', 'Rice', 'Chicken', 'Beef', 'Tofu', 'Lentils',
+    'Chickpeas', 'Lemon', 'Ginger', 'Cumin', 'Paprika', 'Carrot', 'Potato',
+    'Spinach', 'Mushroom', 'Cheese', 'Cream', 'Honey', 'Chili', 'Coconut',
+    'Parsley', 'Thyme', 'Oregano', 'Salmon', 'Shrimp', 'Pork', 'Beans',
+    'Corn', 'Pumpkin', 'Apple', 'Almond',
+]
+FORMS = [
+    '', 'Fresh', 'Dried', 'Ground', 'Smoked', 'Chopped', 'Roasted',
+    'Frozen', 'Organic', 'Pickled',
+]
+TAGS = [
+    'Vegan', 'Vegetarian', 'Dinner', 'Lunch', 'Breakfast', 'Dessert',
+    'Quick', 'Healthy', 'Comfort', 'Spicy', 'Gluten Free', 'Budget',
+    'Party', 'Summer', 'Winter', 'Kids', 'Baking', 'Grill', 'One Pot',
+    'Meal Prep',
+]
+CUISINES = [
+    '', 'Italian', 'Thai', 'Mexican', 'Indian', 'French', 'Japanese',
+    'Greek', 'Korean', 'Moroccan', 'Spanish',
+]
+WORDS = [
+    'stir', 'simmer', 'until', 'golden', 'serve', 'with', 'warm', 'bread',
+    'season', 'to', 'taste', 'bake', 'for', 'minutes', 'fold', 'in', 'the',
+    'sauce', 'and', 'garnish', 'fresh', 'herbs', 'rest', 'before', 'slice',
+]
+TAG_NAMES = [
+    f'{cuisine} {tag}'.strip() for cuisine in CUISINES for tag in TAGS
+]
+INGREDIENT_NAMES = [
+    f'{form} {name}'.strip() for form in FORMS for name in INGREDIENTS
+]
+
+
+@lru_cache(maxsize=None)
+def zipf_cum_weights(n, exponent):
+    '''cumulative weights drawing rank k with probability ~ 1 / k**s'''
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, n + 1)
+    ))
+
+
+def split(total, weights):
+    '''split total into integer shares proportional to weights'''
+    scale = total / sum(weights)
+    shares = [int(weight * scale) for weight in weights]
+    for i in range(total - sum(shares)):
+        shares[i % len(shares)] += 1
+    return shares
+
+
+def copy_value(value):
+    '''format a value for COPY ... FROM STDIN text format'''
+    if value is None:
+        return '\\N'
+    return (
+        str(value).replace('\\', '\\\\').replace('\t', '\\t')
+        .replace('\n', '\\n').replace('\r', '\\r')
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'generate users, tags, ingredients and recipes for performance '
+        'testing, the same data for the same --seed'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--recipes', type=int, default=1000,
+                            help='recipes over all users, skewed by rank')
+        parser.add_argument('--tags', type=int, default=50,
+                            help='tag vocabulary of every user')
+        parser.add_argument('--ingredients', type=int, default=200,
+                            help='ingredient vocabulary of every user')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='zipf exponent of recipes per user and of '
+                                 'tag/ingredient reuse')
+        parser.add_argument('--images', type=int, default=0,
+                            help='number of placeholder images to share')
+        parser.add_argument('--image-ratio', type=float, default=0.5,
+                            help='fraction of recipes with an image')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='seed',
+                            help='users are <prefix>-<n>@example.com')
+        parser.add_argument('--password', default='seed-password')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--no-search-index', action='store_true',
+                            help='leave search vectors empty')
+        parser.add_argument('--no-analyze', action='store_true',
+                            help='leave the table statistics alone, which '
+                                 'slows down filling the search vectors')
+
+    def handle(self, *args, **options):
+        for name in ['users', 'batch_size']:
+            if options[name] < 1:
+                raise CommandError(f'--{name.replace("_", "-")} must be >= 1')
+        for name in ['recipes', 'tags', 'ingredients', 'images']:
+            if options[name] < 0:
+                raise CommandError(f'--{name} must be >= 0')
+        self.options = options
+        self.rng = random.Random(options['seed'])
+        self.use_copy = connection.vendor == 'postgresql'
+
+        users = self._create_users()
+        tags = self._create_vocabulary(
+            Tag, users, TAG_NAMES, options['tags']
+        )
+        ingredients = self._create_vocabulary(
+            Ingredient, users, INGREDIENT_NAMES, options['ingredients']
+        )
+        images = self._create_images()
+
+        counts = split(
+            options['recipes'],
+            [1 / rank ** options['skew']
+             for rank in range(1, len(users) + 1)],
+        )
+        next_id = (Recipe.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        created = 0
+        batch = self._empty_batch()
+        for user_id, count in zip(users, counts):
+            for _ in range(count):
+                self._add_recipe(
+                    batch, next_id + created, user_id,
+                    tags[user_id], ingredients[user_id], images,
+                )
+                created += 1
+                if len(batch[Recipe]) >= options['batch_size']:
+                    self._load(batch)
+                    batch = self._empty_batch()
+        self._load(batch)
+        with connection.cursor() as cursor:
+            # recipes were inserted with explicit ids
+            reset = connection.ops.sequence_reset_sql(no_style(), [Recipe])
+            for sql in reset:
+                cursor.execute(sql)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'seeded {len(users)} users and {created} recipes'
+        ))
+
+    def _create_users(self):
+        '''bulk create the users and return their ids, busiest first'''
+        prefix = self.options['prefix']
+        emails = [
+            f'{prefix}-{n}@example.com'
+            for n in range(self.options['users'])
+        ]
+        User = get_user_model()
+        if User.objects.filter(email__in=emails).exists():
+            raise CommandError(
+                f'users {prefix}-*@example.com exist, pick another --prefix'
+            )
+        # hashing once keeps thousands of users from taking minutes
+        password = make_password(self.options['password'])
+        User.objects.bulk_create(
+            [User(email=email, name=email, password=password)
+             for email in emails],
+            batch_size=self.options['batch_size'],
+        )
+        ids = dict(
+            User.objects.filter(email__in=emails).values_list('email', 'id')
+        )
+        return [ids[email] for email in emails]
+
+    def _create_vocabulary(self, model, users, names, size):
+        '''give every user size names, return user id to ids by rank'''
+        ranked = {}
+        for user_id in users:
+            ranked[user_id] = self.rng.sample(names, min(size, len(names)))
+        model.objects.bulk_create(
+            [model(user_id=user_id, name=name)
+             for user_id, user_names in ranked.items()
+             for name in user_names],
+            batch_size=self.options['batch_size'],
+        )
+        ids = {
+            (user_id, name): obj_id
+            for user_id, name, obj_id in model.objects.filter(
+                user__in=users
+            ).values_list('user_id', 'name', 'id').iterator()
+        }
+        return {
+            user_id: [ids[user_id, name] for name in user_names]
+            for user_id, user_names in ranked.items()
+        }
+
+    def _create_images(self):
+        '''save placeholder images and thumbnails, return their names'''
+        storage = Recipe._meta.get_field('image').storage
+        names = []
+        for _ in range(self.options['images']):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            image = Image.new('RGB', (1024, 768), color)
+            name = storage.save(
+                recipe_image_file_path(None, 'placeholder.jpg'),
+                ContentFile(self._jpeg(image)),
+            )
+            image.thumbnail(THUMBNAIL_SIZE)
+            if not default_storage.exists(thumbnail_name(name)):
+                default_storage.save(
+                    thumbnail_name(name), ContentFile(self._jpeg(image))
+                )
+            names.append(name)
+        return names
+
+    def _jpeg(self, image):
+        out = io.BytesIO()
+        image.save(out, format='JPEG', quality=85)
+        return out.getvalue()
+
+    def _empty_batch(self):
+        return {
+            Recipe: [],
+            Recipe.tags.through: [],
+            Recipe.ingredients.through: [],
+        }
+
+    def _draw(self, ids, low, high):
+        '''distinct ids, low ranks far more often than high ones'''
+        if not ids:
+            return []
+        cum_weights = zipf_cum_weights(len(ids), self.options['skew'])
+        k = self.rng.randint(low, high)
+        return list(dict.fromkeys(
+            self.rng.choices(ids, cum_weights=cum_weights, k=k)
+        ))
+
+    def _add_recipe(self, batch, recipe_id, user_id, tags, ingredients,
+                    images):
+        rng = self.rng
+        now = timezone.now()
+        image = None
+        if images and rng.random() < self.options['image_ratio']:
+            image = rng.choice(images)
+        batch[Recipe].append({
+            'id': recipe_id,
+            'user_id': user_id,
+            'title': f'{rng.choice(ADJECTIVES)} {rng.choice(DISHES)}',
+            'description': ' '.join(rng.choices(WORDS, k=rng.randint(5, 40))),
+            'time_minutes': max(
+                1, min(600, int(rng.lognormvariate(3.2, 0.7)))
+            ),
+            'price': Decimal(rng.randint(100, 6000)) / 100,
+            'link': (
+                f'https://example.com/recipes/{recipe_id}'
+                if rng.random() < 0.3 else ''
+            ),
+            'image': image,
+            'image_status': Recipe.IMAGE_READY if image else '',
+            'created_at': now,
+            'updated_at': now,
+        })
+        for tag_id in self._draw(tags, 0, 5):
+            batch[Recipe.tags.through].append(
+                {'recipe_id': recipe_id, 'tag_id': tag_id}
+            )
+        for ingredient_id in self._draw(ingredients, 2, 12):
+            batch[Recipe.ingredients.through].append(
+                {'recipe_id': recipe_id, 'ingredient_id': ingredient_id}
+            )
+
+    def _load(self, batch):
+        '''insert a batch of rows per model in one transaction'''
+        if not batch[Recipe]:
+            return
+        with transaction.atomic():
+            for model, rows in batch.items():
+                # empty without tags or ingredients, or when none were drawn
+                if not rows:
+                    continue
+                if self.use_copy:
+                    self._copy(model, rows)
+                else:
+                    model.objects.bulk_create(
+                        [model(**row) for row in rows],
+                        batch_size=self.options['batch_size'],
+                    )
+            if self.use_copy and not self.options['no_analyze']:
+                # fresh statistics keep the per recipe name lookups of the
+                # search vectors on the indexes
+                self._analyze(batch)
+            if not self.options['no_search_index']:
+                update_search_vectors(
+                    id__gte=batch[Recipe][0]['id'],
+                    id__lte=batch[Recipe][-1]['id'],
+                )
+        if self.options['verbosity'] > 1:
+            self.stdout.write(
+                f"loaded recipes up to id {batch[Recipe][-1]['id']}"
+            )
+
+    def _analyze(self, models):
+        quote = connection.ops.quote_name
+        tables = [Tag, Ingredient, *models]
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE ' + ', '.join(
+                quote(model._meta.db_table) for model in tables
+            ))
+
+    def _copy(self, model, rows):
+        '''stream rows into the table of model with COPY'''
+        attnames = list(rows[0])
+        quote = connection.ops.quote_name
+        columns = ', '.join(
+            quote(model._meta.get_field(name).column) for name in attnames
+        )
+        data = io.StringIO()
+        for row in rows:
+            data.write('\t'.join(copy_value(row[name]) for name in attnames))
+            data.write('\n')
+        data.seek(0)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN',
+                data,
+            )
@@ -0,0 +1,111 @@
+'''prometheus metrics of the apis
+
+Nothing is recorded unless prometheus_client is installed and
+METRICS_ENABLED is set. Every worker process keeps its own samples; with
+PROMETHEUS_MULTIPROC_DIR pointing at a directory emptied before the
+workers start, they write them to files there instead and export_metrics
+adds up the samples of all of them.
+'''
+import os
+from contextlib import contextmanager
+
+from django.conf import settings
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+
+LATENCY_BUCKETS = (
+    .005, .01, .025, .05, .075, .1, .25, .5, .75, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+# 16 KiB up to the 20 MiB RECIPE_IMAGE_MAX_UPLOAD_SIZE default
+UPLOAD_BUCKETS = tuple(2 ** power for power in range(14, 25, 2)) + (
+    20 * 2 ** 20,
+)
+
+if prometheus_client is not None:
+    REQUEST_LATENCY = prometheus_client.Histogram(
+        'api_request_duration_seconds', 'Latency of requests by handler.',
+        ['handler', 'method', 'status'], buckets=LATENCY_BUCKETS,
+    )
+    REQUESTS_IN_PROGRESS = prometheus_client.Gauge(
+        'api_requests_in_progress', 'Requests being handled.',
+        multiprocess_mode='livesum',
+    )
+    DB_QUERIES = prometheus_client.Histogram(
+        'api_db_queries', 'Database queries run per request.',
+        ['handler'], buckets=QUERY_BUCKETS,
+    )
+    DB_DURATION = prometheus_client.Histogram(
+        'api_db_duration_seconds', 'Time spent in queries per request.',
+        ['handler'], buckets=LATENCY_BUCKETS,
+    )
+    CACHE_LOOKUPS = prometheus_client.Counter(
+        'api_cache_lookups', 'Cache lookups by cache and result.',
+        ['cache', 'result'],
+    )
+    IMAGE_UPLOAD_BYTES = prometheus_client.Histogram(
+        'api_image_upload_bytes', 'Size of uploaded recipe images.',
+        ['source'], buckets=UPLOAD_BUCKETS,
+    )
+
+
+def metrics_enabled():
+    return prometheus_client is not None and settings.METRICS_ENABLED
+
+
+def handler_name(view_func, method):
+    '''viewset and action, or view, a view function is dispatched to'''
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__name__', 'unknown')
+    action = (getattr(view_func, 'actions', None) or {}).get(method.lower())
+    return f'{cls.__name__}.{action}' if action else cls.__name__
+
+
+@contextmanager
+def track_request():
+    '''count the block as a request in progress'''
+    if not metrics_enabled():
+        yield
+        return
+    REQUESTS_IN_PROGRESS.inc()
+    try:
+        yield
+    finally:
+        REQUESTS_IN_PROGRESS.dec()
+
+
+def record_request(handler, method, status, seconds, queries, db_seconds):
+    if not metrics_enabled():
+        return
+    REQUEST_LATENCY.labels(handler, method, status).observe(seconds)
+    DB_QUERIES.labels(handler).observe(queries)
+    DB_DURATION.labels(handler).observe(db_seconds)
+
+
+def record_cache_lookup(cache, hit):
+    if metrics_enabled():
+        CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def record_image_upload(source, size):
+    if metrics_enabled():
+        IMAGE_UPLOAD_BYTES.labels(source).observe(size)
+
+
+def export_metrics():
+    '''(body, content type) of the metrics in the text format'''
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return (
+        prometheus_client.generate_latest(registry),
+        prometheus_client.CONTENT_TYPE_LATEST,
+    )
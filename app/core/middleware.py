@@ -0,0 +1,124 @@
+'''middleware shared by the apis'''
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from core.metrics import (
+    handler_name,
+    metrics_enabled,
+    record_request,
+    track_request,
+)
+from core.timing import RequestTimings
+
+
+logger = logging.getLogger(__name__)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+class ServerTimingMiddleware:
+    '''time a sample of api requests
+
+    Sampled responses get a Server-Timing header with the query count and
+    the database, serializer, view, render and total milliseconds, and the
+    same numbers are logged as JSON. Database and serializer time overlap
+    the view time they are part of.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def _sampled(self, request):
+        rate = settings.SERVER_TIMING_SAMPLE_RATE
+        return (
+            rate > 0 and
+            request.path.startswith(tuple(settings.SERVER_TIMING_PATHS)) and
+            (rate >= 1 or random.random() < rate)
+        )
+
+    def __call__(self, request):
+        if not self._sampled(request):
+            return self.get_response(request)
+        timings = request.timings = RequestTimings()
+        start = time.perf_counter()
+        with timings.activate(), connection.execute_wrapper(timings):
+            response = self.get_response(request)
+        end = time.perf_counter()
+        self._report(request, response, timings, start, end)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, 'timings'):
+            request.timings.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns
+        if hasattr(request, 'timings'):
+            request.timings.view_end = time.perf_counter()
+        return response
+
+    def _report(self, request, response, timings, start, end):
+        view_start = getattr(timings, 'view_start', None)
+        view_end = getattr(timings, 'view_end', end)
+        metrics = [('db', timings.db, f'{timings.queries} queries')]
+        metrics += [
+            (name, seconds, None)
+            for name, seconds in sorted(timings.spans.items())
+        ]
+        if view_start is not None:
+            metrics.append(('view', view_end - view_start, None))
+            if view_end < end:
+                metrics.append(('render', end - view_end, None))
+        metrics.append(('total', end - start, None))
+
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={_ms(seconds)}' +
+            (f';desc="{desc}"' if desc else '')
+            for name, seconds, desc in metrics
+        )
+        match = request.resolver_match
+        fields = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': timings.queries,
+        }
+        fields.update(
+            (f'{name}_ms', _ms(seconds)) for name, seconds, _ in metrics
+        )
+        logger.info(
+            'server timing %s', json.dumps(fields, sort_keys=True),
+            extra={'server_timing': fields},
+        )
+
+
+class MetricsMiddleware:
+    '''record latency, queries and in flight counts of every request'''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metrics_enabled():
+            return self.get_response(request)
+        queries = RequestTimings()
+        start = time.perf_counter()
+        with track_request(), connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        record_request(
+            getattr(request, 'metrics_handler', 'unresolved'),
+            request.method, response.status_code,
+            time.perf_counter() - start, queries.queries, queries.db,
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_handler = handler_name(view_func, request.method)
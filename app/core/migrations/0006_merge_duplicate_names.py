@@ -0,0 +1,51 @@
+# Generated by Django 3.2.25 on 2026-10-17 00:36
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    '''fold duplicate (user, name) tags and ingredients into the oldest'''
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field_name in [('Tag', 'tags'),
+                                   ('Ingredient', 'ingredients')]:
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field_name).through
+        target = f'{model_name.lower()}_id'
+        duplicates = (
+            model.objects.values('user', 'name')
+            .annotate(keep=Min('id'), total=Count('id'))
+            .filter(total__gt=1)
+        )
+        for group in duplicates:
+            drop_ids = list(
+                model.objects.filter(user=group['user'], name=group['name'])
+                .exclude(id=group['keep'])
+                .values_list('id', flat=True)
+            )
+            linked = set(
+                through.objects.filter(**{target: group['keep']})
+                .values_list('recipe_id', flat=True)
+            )
+            for link in through.objects.filter(**{f'{target}__in': drop_ids}):
+                if link.recipe_id in linked:
+                    link.delete()
+                else:
+                    setattr(link, target, group['keep'])
+                    link.save()
+                    linked.add(link.recipe_id)
+            model.objects.filter(id__in=drop_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_names,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-17 00:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_recipe_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ('pending', 'Pending'),
+                    ('processing', 'Processing'),
+                    ('ready', 'Ready'),
+                    ('failed', 'Failed')
+                ],
+                max_length=16
+            ),
+        ),
+    ]
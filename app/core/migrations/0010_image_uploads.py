@@ -0,0 +1,61 @@
+# Generated by Django 3.2.25 on 2026-10-17 00:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipe_image_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageUpload',
+            fields=[
+                ('id', models.UUIDField(
+                    default=uuid.uuid4,
+                    editable=False,
+                    primary_key=True,
+                    serialize=False
+                )),
+                ('filename', models.CharField(max_length=255)),
+                ('size', models.PositiveBigIntegerField()),
+                ('received', models.PositiveBigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('recipe', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='image_uploads',
+                    to='core.recipe'
+                )),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ImageUploadChunk',
+            fields=[
+                ('id', models.BigAutoField(
+                    auto_created=True,
+                    primary_key=True,
+                    serialize=False,
+                    verbose_name='ID'
+                )),
+                ('offset', models.PositiveBigIntegerField()),
+                ('name', models.CharField(max_length=255)),
+                ('upload', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='chunks',
+                    to='core.imageupload'
+                )),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='imageuploadchunk',
+            constraint=models.UniqueConstraint(
+                fields=('upload', 'offset'),
+                name='unique_upload_chunk_offset'
+            ),
+        ),
+    ]
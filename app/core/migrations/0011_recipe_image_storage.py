@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-17 00:55
+
+import core.models
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_image_uploads'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(
+                null=True,
+                storage=core.storage.recipe_image_storage,
+                upload_to=core.models.recipe_image_file_path
+            ),
+        ),
+    ]
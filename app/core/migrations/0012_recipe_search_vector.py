@@ -0,0 +1,64 @@
+# Generated by Django 3.2.25 on 2026-10-17 00:57
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def _weighted(expression, weight):
+    return (
+        f"setweight(to_tsvector('english', coalesce({expression}, '')), "
+        f"'{weight}')"
+    )
+
+
+def _names(table, column):
+    return (
+        f'(SELECT string_agg(a.name, \' \') FROM core_{table} a '
+        f'JOIN core_recipe_{table}s l ON l.{column} = a.id '
+        f'WHERE l.recipe_id = core_recipe.id)'
+    )
+
+
+CREATE_INDEX = (
+    'CREATE INDEX recipe_search_vector_idx '
+    'ON core_recipe USING gin (search_vector);'
+)
+DROP_INDEX = 'DROP INDEX IF EXISTS recipe_search_vector_idx;'
+# mirrors recipe.search.search_vector for the rows that already exist
+BACKFILL = 'UPDATE core_recipe SET search_vector = {};'.format(' || '.join([
+    _weighted('title', 'A'),
+    _weighted(_names('tag', 'tag_id'), 'B'),
+    _weighted(_names('ingredient', 'ingredient_id'), 'B'),
+    _weighted('description', 'C'),
+]))
+
+
+def create_index(apps, schema_editor):
+    '''GIN indexes and tsvector functions only exist on PostgreSQL'''
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_INDEX)
+        schema_editor.execute(BACKFILL)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_recipe_image_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False,
+                null=True
+            ),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
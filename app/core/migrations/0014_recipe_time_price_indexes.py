@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-17 01:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_name_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['user', 'time_minutes', 'id'],
+                name='recipe_user_time_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(
+                fields=['user', 'price', 'id'],
+                name='recipe_user_price_idx'
+            ),
+        ),
+    ]
@@ -4,6 +4,7 @@ Database models
 import uuid
 import os
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.contrib.auth.models import (
     AbstractBaseUser,
@@ -11,6 +12,8 @@ from django.contrib.auth.models import (
     PermissionsMixin
 )
 
+from core.storage import recipe_image_storage
+
 
 def recipe_image_file_path(instace, filename):
     'generate new file path for new recipe image'
@@ -56,6 +59,17 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 class Recipe(models.Model):
     '''Recipe object'''
+    IMAGE_PENDING = 'pending'
+    IMAGE_PROCESSING = 'processing'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = [
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_PROCESSING, 'Processing'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    ]
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -68,7 +82,34 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(
+        null=True,
+        upload_to=recipe_image_file_path,
+        storage=recipe_image_storage,
+    )
+    image_status = models.CharField(
+        max_length=16, blank=True, choices=IMAGE_STATUS_CHOICES
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # maintained by recipe.search, indexed with GIN on PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='recipe_user_id_idx'),
+            models.Index(
+                fields=['user', 'updated_at'], name='recipe_user_updated_idx'
+            ),
+            # id completes the keyset order of the time and price sorts
+            models.Index(
+                fields=['user', 'time_minutes', 'id'],
+                name='recipe_user_time_idx',
+            ),
+            models.Index(
+                fields=['user', 'price', 'id'], name='recipe_user_price_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -82,6 +123,13 @@ class Tag(models.Model):
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'], name='unique_tag_name_per_user'
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -94,5 +142,71 @@ class Ingredient(models.Model):
         on_delete=models.CASCADE
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'], name='unique_ingredient_name_per_user'
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class ImageUpload(models.Model):
+    '''resumable recipe image upload received as byte ranges'''
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='image_uploads',
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.filename
+
+
+class ImageJob(models.Model):
+    '''staged recipe image waiting for or being processed by a worker
+
+    Rows outlive the process that queued them, gc_images retries the ones
+    a restart left behind.
+    '''
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='image_jobs',
+    )
+    staged_name = models.CharField(max_length=255)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.staged_name
+
+
+class ImageUploadChunk(models.Model):
+    '''stored byte range of a resumable upload starting at offset'''
+    upload = models.ForeignKey(
+        ImageUpload,
+        on_delete=models.CASCADE,
+        related_name='chunks',
+    )
+    offset = models.PositiveBigIntegerField()
+    name = models.CharField(max_length=255)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['upload', 'offset'], name='unique_upload_chunk_offset'
+            ),
+        ]
+
     def __str__(self):
         return self.name
@@ -0,0 +1,44 @@
+'''storage backends for uploaded files'''
+import hashlib
+import os
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage, get_storage_class
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    '''store files under the sha256 of their content, sharing duplicates
+
+    Files are never overwritten or deleted here, unreferenced ones are
+    removed by the gc_images management command.
+    '''
+
+    def content_name(self, name, content):
+        '''hash content chunk by chunk and return its storage name'''
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        ext = os.path.splitext(name)[1].lower()
+        return posixpath.join(
+            posixpath.dirname(name), digest[:2], f'{digest}{ext}'
+        )
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # refresh the mtime so a concurrent gc run sees a recent file
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+def recipe_image_storage():
+    '''return the storage of recipe images selected in the settings'''
+    if settings.RECIPE_IMAGE_CONTENT_ADDRESSED:
+        return ContentAddressedStorage()
+    return get_storage_class()()
@@ -1,10 +1,33 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as PE
 
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import (
+    LiveServerTestCase,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from PIL import Image
+
+from benchmarks.load import summarize
+from core.models import ImageJob, ImageUpload, ImageUploadChunk, Recipe
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -23,3 +46,485 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class ImportRecipesCommandTests(TestCase):
+    '''test importing recipes from the command line'''
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+
+    def test_import_recipes(self):
+        rows = [
+            {'title': 'one', 'time_minutes': 5, 'price': '1.00',
+             'tags': [{'name': 'Quick'}]},
+            {'title': 'two', 'time_minutes': 5},
+            {'title': 'three', 'time_minutes': 5, 'price': '3.00',
+             'tags': [{'name': 'Quick'}]},
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as f:
+            f.write('\n'.join(json.dumps(row) for row in rows))
+            f.flush()
+            out, err = StringIO(), StringIO()
+            call_command(
+                'import_recipes', f.name, email=self.user.email,
+                chunk_size=2, stdout=out, stderr=err,
+            )
+
+        self.assertIn('imported 2 recipes', out.getvalue())
+        self.assertIn('line 2', err.getvalue())
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 2)
+        self.assertEqual(self.user.tag_set.count(), 1)
+
+    def test_import_recipes_unknown_user(self):
+        with self.assertRaises(CommandError):
+            call_command('import_recipes', '-', email='nobody@example.com')
+
+    def test_import_recipes_invalid_chunk_size(self):
+        for chunk_size in ['0', '-1', 'x']:
+            with self.assertRaisesRegex(CommandError, 'chunk-size'):
+                call_command(
+                    'import_recipes', '-', f'--chunk-size={chunk_size}',
+                    email=self.user.email,
+                )
+
+    def test_import_recipes_missing_file(self):
+        with self.assertRaisesRegex(CommandError, 'cannot read'):
+            call_command(
+                'import_recipes', '/nonexistent/recipes.ndjson',
+                email=self.user.email,
+            )
+
+
+class GcImagesCommandTests(TestCase):
+    '''test collecting unreferenced image files'''
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = self.settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+
+    def _save(self, name):
+        return default_storage.save(name, ContentFile(b'data'))
+
+    def _recipe(self, image):
+        return Recipe.objects.create(
+            user=self.user, title='recipe', time_minutes=5,
+            price=Decimal('1.00'), image=image,
+        )
+
+    def _gc(self, **options):
+        out = StringIO()
+        call_command('gc_images', grace_minutes=0, stdout=out, **options)
+        return out.getvalue()
+
+    def test_gc_keeps_referenced_files(self):
+        image = self._save('uploads/recipe/kept.jpg')
+        derived = [
+            self._save('uploads/recipe/kept_thumb.jpg'),
+            self._save('uploads/recipe/kept_128.jpg'),
+        ]
+        self._recipe(image)
+        self._recipe(image)
+
+        out = self._gc()
+
+        self.assertIn('deleted 0 files', out)
+        self.assertIn('1 images are shared', out)
+        for name in [image] + derived:
+            self.assertTrue(default_storage.exists(name))
+
+    def test_gc_deletes_files_of_deleted_recipes(self):
+        image = self._save('uploads/recipe/gone.jpg')
+        thumb = self._save('uploads/recipe/gone_thumb.jpg')
+        self._recipe(image).delete()
+
+        out = self._gc()
+
+        self.assertIn('deleted 2 files (8 bytes)', out)
+        self.assertFalse(default_storage.exists(image))
+        self.assertFalse(default_storage.exists(thumb))
+
+    def test_gc_deletes_leftover_staging_and_chunks(self):
+        staged = self._save('uploads/staging/left.jpg')
+        orphan_chunk = self._save('uploads/partial/orphan')
+        upload = ImageUpload.objects.create(
+            recipe=self._recipe(None), filename='a.jpg', size=8,
+        )
+        chunk = self._save('uploads/partial/live')
+        ImageUploadChunk.objects.create(upload=upload, offset=0, name=chunk)
+
+        self._gc()
+
+        self.assertFalse(default_storage.exists(staged))
+        self.assertFalse(default_storage.exists(orphan_chunk))
+        self.assertTrue(default_storage.exists(chunk))
+
+    def test_gc_discards_stale_uploads(self):
+        upload = ImageUpload.objects.create(
+            recipe=self._recipe(None), filename='a.jpg', size=8,
+        )
+        chunk = self._save('uploads/partial/stale')
+        ImageUploadChunk.objects.create(upload=upload, offset=0, name=chunk)
+        ImageUpload.objects.filter(pk=upload.pk).update(
+            updated_at=timezone.now() - timedelta(days=2)
+        )
+
+        self._gc()
+
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertFalse(default_storage.exists(chunk))
+
+    def test_gc_fails_abandoned_image_jobs(self):
+        abandoned = self._recipe(None)
+        queued = self._recipe(None)
+        Recipe.objects.filter(pk=abandoned.pk).update(
+            image_status=Recipe.IMAGE_PROCESSING,
+            updated_at=timezone.now() - timedelta(hours=2),
+        )
+        Recipe.objects.filter(pk=queued.pk).update(
+            image_status=Recipe.IMAGE_PENDING
+        )
+
+        out = StringIO()
+        call_command('gc_images', stdout=out)
+
+        self.assertIn(
+            'retried 0 and failed 1 abandoned image jobs', out.getvalue()
+        )
+        abandoned.refresh_from_db()
+        queued.refresh_from_db()
+        self.assertEqual(abandoned.image_status, Recipe.IMAGE_FAILED)
+        self.assertGreater(
+            abandoned.updated_at, timezone.now() - timedelta(minutes=1)
+        )
+        self.assertEqual(queued.image_status, Recipe.IMAGE_PENDING)
+
+    def _lost_job(self, content, attempts=1):
+        '''image job a restart left behind two hours ago'''
+        recipe = self._recipe(None)
+        Recipe.objects.filter(pk=recipe.pk).update(
+            image_status=Recipe.IMAGE_PROCESSING
+        )
+        job = ImageJob.objects.create(
+            recipe=recipe, attempts=attempts,
+            staged_name=default_storage.save(
+                'uploads/staging/lost.jpg', ContentFile(content)
+            ),
+        )
+        ImageJob.objects.filter(pk=job.pk).update(
+            updated_at=timezone.now() - timedelta(hours=2)
+        )
+        return recipe, job
+
+    def test_gc_retries_lost_image_jobs(self):
+        image = BytesIO()
+        Image.new('RGB', (10, 10)).save(image, format='JPEG')
+        recipe, job = self._lost_job(image.getvalue())
+
+        out = StringIO()
+        call_command('gc_images', dry_run=True, stdout=out)
+        self.assertIn('would retry 1 and would fail 0', out.getvalue())
+        self.assertTrue(default_storage.exists(job.staged_name))
+
+        out = StringIO()
+        call_command('gc_images', stdout=out)
+
+        self.assertIn('retried 1 and failed 0', out.getvalue())
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, Recipe.IMAGE_READY)
+        self.assertTrue(recipe.image)
+        self.assertFalse(ImageJob.objects.exists())
+        self.assertFalse(default_storage.exists(job.staged_name))
+
+    def test_gc_gives_up_repeatedly_lost_image_jobs(self):
+        recipe, _ = self._lost_job(b'data', attempts=3)
+
+        out = StringIO()
+        call_command('gc_images', stdout=out)
+
+        self.assertIn('retried 0 and failed 1', out.getvalue())
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_status, Recipe.IMAGE_FAILED)
+        self.assertFalse(ImageJob.objects.exists())
+
+    def test_gc_keeps_staged_files_of_queued_jobs(self):
+        staged = self._save('uploads/staging/queued.jpg')
+        old = (timezone.now() - timedelta(hours=2)).timestamp()
+        os.utime(default_storage.path(staged), (old, old))
+        ImageJob.objects.create(recipe=self._recipe(None), staged_name=staged)
+
+        out = StringIO()
+        call_command('gc_images', stdout=out)
+
+        self.assertIn('deleted 0 files', out.getvalue())
+
+        self.assertTrue(default_storage.exists(staged))
+
+    def test_gc_dry_run_and_grace_period_keep_files(self):
+        image = self._save('uploads/recipe/orphan.jpg')
+
+        out = self._gc(dry_run=True)
+        self.assertIn('would delete 1 files', out)
+        out = StringIO()
+        call_command('gc_images', stdout=out)
+        self.assertIn('deleted 0 files', out.getvalue())
+
+        self.assertTrue(default_storage.exists(image))
+
+
+class SeedRecipesCommandTests(TestCase):
+    '''test generating recipes for performance testing'''
+
+    def _seed(self, **options):
+        out = StringIO()
+        # ANALYZE outlives the test transaction and would change the
+        # plans later tests see
+        options = {
+            'users': 3, 'recipes': 30, 'seed': 7, 'no_analyze': True,
+            **options,
+        }
+        call_command('seed_recipes', stdout=out, **options)
+        return out.getvalue()
+
+    def _snapshot(self, prefix):
+        '''recipes of the seeded users, comparable across prefixes'''
+        return [
+            (user.email.split('@')[0].split('-', 1)[1], [
+                (recipe.title, recipe.price, recipe.time_minutes,
+                 sorted(tag.name for tag in recipe.tags.all()),
+                 sorted(item.name for item in recipe.ingredients.all()))
+                for recipe in user.recipe_set.order_by('id')
+            ])
+            for user in get_user_model().objects.filter(
+                email__startswith=f'{prefix}-'
+            ).order_by('email')
+        ]
+
+    def test_seed_recipes(self):
+        out = self._seed(batch_size=7)
+
+        self.assertIn('seeded 3 users and 30 recipes', out)
+        counts = [
+            Recipe.objects.filter(user__email=f'seed-{n}@example.com').count()
+            for n in range(3)
+        ]
+        self.assertEqual(sum(counts), 30)
+        self.assertGreater(counts[0], counts[2])
+        self.assertTrue(Recipe.tags.through.objects.exists())
+        self.assertFalse(
+            Recipe.objects.filter(search_vector__isnull=True).exists()
+        )
+        user = get_user_model().objects.get(email='seed-0@example.com')
+        self.assertTrue(user.check_password('seed-password'))
+        # the id sequence continues after the explicit ids
+        self.assertGreater(
+            Recipe.objects.create(user=user, title='new', time_minutes=1,
+                                  price=Decimal('1.00')).id,
+            Recipe.objects.exclude(title='new').order_by('-id')[0].id,
+        )
+
+    def test_seed_recipes_no_analyze(self):
+        with CaptureQueriesContext(connection) as queries:
+            self._seed()
+
+        self.assertFalse(any(
+            query['sql'].startswith('ANALYZE') for query in queries
+        ))
+
+    def test_seed_recipes_without_tags(self):
+        self.assertEqual(connection.vendor, 'postgresql')
+
+        self._seed(tags=0, ingredients=0)
+
+        self.assertEqual(Recipe.objects.count(), 30)
+        self.assertFalse(Recipe.tags.through.objects.exists())
+        self.assertFalse(Recipe.ingredients.through.objects.exists())
+
+    def test_seed_recipes_deterministic(self):
+        self._seed(prefix='a')
+        with patch(
+            'core.management.commands.seed_recipes.connection.vendor',
+            'other',
+        ):
+            # bulk_create rather than COPY loads the same data
+            self._seed(prefix='b')
+
+        self.assertEqual(self._snapshot('a'), self._snapshot('b'))
+        self.assertNotEqual(self._snapshot('a'), [])
+
+    def test_seed_recipes_existing_users(self):
+        self._seed()
+
+        with self.assertRaises(CommandError):
+            self._seed()
+
+    def test_seed_recipes_invalid_counts(self):
+        for options in [{'users': 0}, {'recipes': -1}, {'batch_size': 0}]:
+            with self.assertRaises(CommandError):
+                self._seed(**options)
+
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_seed_recipes_placeholder_images(self):
+        with tempfile.TemporaryDirectory() as media, \
+                self.settings(MEDIA_ROOT=media):
+            self._seed(images=2, image_ratio=1)
+
+            names = set(Recipe.objects.values_list('image', flat=True))
+            self.assertEqual(len(names), 2)
+            for name in names:
+                self.assertTrue(default_storage.exists(name))
+        self.assertFalse(
+            Recipe.objects.exclude(image_status=Recipe.IMAGE_READY).exists()
+        )
+
+
+@override_settings(ALLOWED_HOSTS=['localhost'], RECIPE_IMAGE_WORKERS=0)
+class BenchApiCommandTests(TestCase):
+    '''test the api load benchmark'''
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = self.settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        call_command(
+            'seed_recipes', users=2, recipes=20, no_analyze=True,
+            stdout=StringIO(),
+        )
+
+    def _bench(self, **options):
+        out = StringIO()
+        with tempfile.NamedTemporaryFile('r', suffix='.json') as f:
+            call_command('bench_api', requests=60, warmup=5, output=f.name,
+                         stdout=out, **options)
+            return json.load(f), out.getvalue()
+
+    def test_bench_api(self):
+        results, out = self._bench()
+
+        self.assertEqual(results['total']['requests'], 60)
+        self.assertEqual(results['total']['errors'], 0)
+        self.assertEqual(results['meta']['driver'], 'client')
+        self.assertIn('recipe-list', results['endpoints'])
+        for row in results['endpoints'].values():
+            self.assertLessEqual(row['p50_ms'], row['p95_ms'])
+            self.assertLessEqual(row['p95_ms'], row['p99_ms'])
+            self.assertIsNotNone(row['queries_per_request'])
+        self.assertIn('60 requests', out)
+
+    def test_bench_api_is_repeatable_and_compares(self):
+        first, _ = self._bench(mix='recipe-detail=1,tag-typeahead=2')
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as f:
+            json.dump(first, f)
+            f.flush()
+            second, out = self._bench(
+                mix='recipe-detail=1,tag-typeahead=2', compare=f.name
+            )
+
+        self.assertEqual(
+            {name: row['requests']
+             for name, row in first['endpoints'].items()},
+            {name: row['requests']
+             for name, row in second['endpoints'].items()},
+        )
+        self.assertIn('tag-typeahead', out)
+        self.assertIn('->', out)
+
+    def test_bench_api_rejects_unknown_endpoints(self):
+        with self.assertRaises(CommandError):
+            self._bench(mix='recipe-list=1,nothing=2')
+        for mix in ['recipe-list=0', 'recipe-list=0,tag-typeahead=0',
+                    'recipe-list=-1', 'recipe-list=inf']:
+            with self.assertRaises(CommandError):
+                self._bench(mix=mix)
+        with self.assertRaises(CommandError):
+            self._bench(prefix='nobody')
+
+    def test_bench_api_rejects_invalid_counts(self):
+        for options in [{'requests': 0}, {'warmup': -1}, {'users': 0}]:
+            with self.assertRaises(CommandError):
+                call_command('bench_api', stdout=StringIO(), **options)
+
+    def test_summary_without_samples(self):
+        summary = summarize([], 0)['total']
+
+        self.assertEqual(summary['requests'], 0)
+        self.assertIsNone(summary['mean_ms'])
+        self.assertIsNone(summary['p95_ms'])
+
+
+@override_settings(RECIPE_IMAGE_WORKERS=0)
+class BenchApiHttpDriverTests(LiveServerTestCase):
+    '''test the http driver of the load benchmark'''
+
+    def test_bench_api_http_driver(self):
+        call_command(
+            'seed_recipes', users=1, recipes=5, no_analyze=True,
+            stdout=StringIO(),
+        )
+
+        with tempfile.NamedTemporaryFile('r', suffix='.json') as f:
+            call_command(
+                'bench_api', driver='http', url=self.live_server_url,
+                processes=2, requests=20, warmup=0, output=f.name,
+                mix='recipe-list=1,recipe-detail=1', stdout=StringIO(),
+            )
+            results = json.load(f)
+
+        self.assertEqual(results['total']['requests'], 20)
+        self.assertEqual(results['total']['errors'], 0)
+        self.assertIsNone(results['total']['queries_per_request'])
+
+
+class BenchMicroCommandTests(TestCase):
+    '''test the micro benchmarks and their baseline'''
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.baseline = os.path.join(directory.name, 'baseline.json')
+
+    def _bench(self, *cases, **options):
+        out = StringIO()
+        call_command('bench_micro', *cases, baseline=self.baseline,
+                     min_time=0.01, repeat=2, stdout=out, **options)
+        return out.getvalue()
+
+    def test_bench_micro_baseline(self):
+        self._bench('image_file_path', 'queryset[plain]',
+                    update_baseline=True)
+        with open(self.baseline) as f:
+            baseline = json.load(f)
+
+        self.assertEqual(
+            set(baseline), {'recipe_image_file_path', 'get_queryset[plain]'}
+        )
+        self.assertGreater(baseline['get_queryset[plain]']['peak_bytes'], 0)
+        out = self._bench('image_file_path', tolerance=100)
+        self.assertIn('1 cases within the baseline', out)
+
+    def test_bench_micro_fails_on_regressions(self):
+        with open(self.baseline, 'w') as f:
+            json.dump({
+                'recipe_image_file_path': {'time_us': 0.001, 'peak_bytes': 0},
+            }, f)
+
+        with self.assertRaisesRegex(CommandError, 'recipe_image_file_path'):
+            self._bench('image_file_path')
+
+    def test_bench_micro_rolls_back_writes(self):
+        self._bench('create[tags=5]', 'update[tags=5]', 'rows[1]')
+
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(get_user_model().objects.exists())
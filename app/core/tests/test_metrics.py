@@ -0,0 +1,267 @@
+import os
+import subprocess
+import sys
+import tempfile
+from decimal import Decimal
+from io import BytesIO
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.models import Recipe
+from user.authentication import token_cache
+
+
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def sample(name, **labels):
+    return metrics.prometheus_client.REGISTRY.get_sample_value(
+        name, labels
+    ) or 0
+
+
+def latency_count(handler, method='GET', status='200'):
+    return sample(
+        'api_request_duration_seconds_count',
+        handler=handler, method=method, status=status,
+    )
+
+
+@skipIf(metrics.prometheus_client is None, 'prometheus_client missing')
+@override_settings(METRICS_ENABLED=True)
+class MetricsTests(TestCase):
+    '''test requests are recorded and exported'''
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=20,
+            price=Decimal('5.50'),
+        )
+
+    def test_latency_by_viewset_action(self):
+        before = latency_count('RecipeViewSet.list')
+        detail_before = latency_count('RecipeViewSet.retrieve')
+        missing_before = latency_count('RecipeViewSet.retrieve', status='404')
+
+        self.client.get(RECIPES_URL)
+        self.client.get(
+            reverse('recipe:recipe-detail', args=[self.recipe.id + 1000])
+        )
+        self.client.get(
+            reverse('recipe:recipe-detail', args=[self.recipe.id])
+        )
+
+        self.assertEqual(latency_count('RecipeViewSet.list'), before + 1)
+        self.assertEqual(
+            latency_count('RecipeViewSet.retrieve'), detail_before + 1
+        )
+        self.assertEqual(
+            latency_count('RecipeViewSet.retrieve', status='404'),
+            missing_before + 1,
+        )
+
+    def test_api_view_and_unresolved_handlers(self):
+        before = latency_count('CreateTokenView', 'POST', '200')
+        unresolved = latency_count('unresolved', 'GET', '404')
+
+        self.client.post(reverse('user:token'), {
+            'email': 'user@example.com', 'password': 'testpass123',
+        })
+        self.client.get('/api/recipe/missing/')
+
+        self.assertEqual(
+            latency_count('CreateTokenView', 'POST', '200'), before + 1
+        )
+        self.assertEqual(
+            latency_count('unresolved', 'GET', '404'), unresolved + 1
+        )
+
+    def test_db_queries_per_request(self):
+        handler = 'RecipeViewSet.retrieve'
+        count = sample('api_db_queries_count', handler=handler)
+        total = sample('api_db_queries_sum', handler=handler)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(
+                reverse('recipe:recipe-detail', args=[self.recipe.id])
+            )
+
+        self.assertEqual(
+            sample('api_db_queries_count', handler=handler), count + 1
+        )
+        self.assertEqual(
+            sample('api_db_queries_sum', handler=handler),
+            total + len(queries),
+        )
+        self.assertEqual(
+            sample('api_db_duration_seconds_count', handler=handler),
+            count + 1,
+        )
+
+    def test_requests_in_progress(self):
+        self.client.get(RECIPES_URL)
+        self.assertEqual(sample('api_requests_in_progress'), 0)
+
+        with metrics.track_request():
+            self.assertEqual(sample('api_requests_in_progress'), 1)
+
+    def test_list_cache_lookups(self):
+        hits = sample('api_cache_lookups_total', cache='list', result='hit')
+        misses = sample(
+            'api_cache_lookups_total', cache='list', result='miss'
+        )
+
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+
+        self.assertEqual(
+            sample('api_cache_lookups_total', cache='list', result='hit'),
+            hits + 1,
+        )
+        self.assertEqual(
+            sample('api_cache_lookups_total', cache='list', result='miss'),
+            misses + 1,
+        )
+
+    def test_token_cache_lookups(self):
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        hits = sample('api_cache_lookups_total', cache='token', result='hit')
+
+        client.get(reverse('user:me'))
+        client.get(reverse('user:me'))
+
+        self.assertEqual(
+            sample('api_cache_lookups_total', cache='token', result='hit'),
+            hits + 1,
+        )
+
+    @override_settings(RECIPE_IMAGE_WORKERS=0)
+    def test_image_upload_sizes(self):
+        image = BytesIO()
+        Image.new('RGB', (10, 10)).save(image, format='JPEG')
+        image.name = 'photo.jpg'
+        image.seek(0)
+        size = len(image.getvalue())
+        count = sample('api_image_upload_bytes_count', source='direct')
+        total = sample('api_image_upload_bytes_sum', source='direct')
+
+        with tempfile.TemporaryDirectory() as media:
+            with override_settings(MEDIA_ROOT=media):
+                res = self.client.post(
+                    reverse('recipe:recipe-upload-image',
+                            args=[self.recipe.id]),
+                    {'image': image}, format='multipart',
+                )
+
+        self.assertEqual(res.status_code, 202)
+        self.assertEqual(
+            sample('api_image_upload_bytes_count', source='direct'),
+            count + 1,
+        )
+        self.assertEqual(
+            sample('api_image_upload_bytes_sum', source='direct'),
+            total + size,
+        )
+
+    def test_metrics_endpoint(self):
+        self.client.get(RECIPES_URL)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        self.assertIn(
+            b'api_request_duration_seconds_bucket{handler="RecipeViewSet.'
+            b'list"', res.content
+        )
+
+    def test_endpoint_limited_to_allowed_ips(self):
+        res = self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(res.status_code, 404)
+
+        with override_settings(METRICS_ALLOWED_IPS=['203.0.113.0/24']):
+            res = self.client.get(METRICS_URL, REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled(self):
+        before = latency_count('RecipeViewSet.list')
+
+        self.client.get(RECIPES_URL)
+
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 404)
+        self.assertEqual(latency_count('RecipeViewSet.list'), before)
+
+    def test_adds_up_worker_processes(self):
+        '''test samples written by several processes are exported'''
+        script = (
+            'import django; django.setup(); '
+            'from core import metrics; '
+            'metrics.record_request("RecipeViewSet.list", "GET", 200, '
+            '0.02, 3, 0.01)'
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                'DJANGO_SETTINGS_MODULE': 'app.settings',
+                'METRICS_ENABLED': '1',
+                'PROMETHEUS_MULTIPROC_DIR': directory,
+            }
+            for _ in range(2):
+                subprocess.run(
+                    [sys.executable, '-c', script],
+                    cwd=settings.BASE_DIR, env=env, check=True,
+                )
+            with patch.dict(os.environ, PROMETHEUS_MULTIPROC_DIR=directory):
+                res = self.client.get(METRICS_URL)
+
+        self.assertIn(
+            b'api_request_duration_seconds_count{handler="RecipeViewSet.'
+            b'list",method="GET",status="200"} 2.0', res.content
+        )
+        self.assertIn(
+            b'api_db_queries_sum{handler="RecipeViewSet.list"} 6.0',
+            res.content,
+        )
+
+
+class HandlerNameTests(TestCase):
+    '''test handlers are named after viewset actions or views'''
+
+    def test_names(self):
+        def view():
+            pass
+
+        class ViewSet:
+            pass
+
+        view.cls = ViewSet
+        view.actions = {'get': 'list', 'post': 'create'}
+        self.assertEqual(metrics.handler_name(view, 'POST'), 'ViewSet.create')
+        self.assertEqual(metrics.handler_name(view, 'DELETE'), 'ViewSet')
+        del view.actions
+        self.assertEqual(metrics.handler_name(view, 'GET'), 'ViewSet')
+        del view.cls
+        self.assertEqual(metrics.handler_name(view, 'GET'), 'view')
@@ -0,0 +1,137 @@
+import json
+import logging
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from core.timing import RequestTimings, timed
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+ME_URL = reverse('user:me')
+
+
+def parse_server_timing(value):
+    '''map metric name to its parameters'''
+    metrics = {}
+    for metric in value.split(', '):
+        name, *params = metric.split(';')
+        metrics[name] = dict(param.split('=', 1) for param in params)
+    return metrics
+
+
+@override_settings(SERVER_TIMING_SAMPLE_RATE=1.0)
+class ServerTimingMiddlewareTests(TestCase):
+    '''test sampled api requests report their timings'''
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        recipe = Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=20,
+            price=Decimal('5.50'),
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+    def test_header_reports_queries_and_timings(self):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL)
+
+        metrics = parse_server_timing(res['Server-Timing'])
+        self.assertEqual(
+            list(metrics),
+            ['db', 'serializer', 'view', 'render', 'total'],
+        )
+        self.assertEqual(
+            metrics['db']['desc'], f'"{len(queries)} queries"'
+        )
+        durations = {
+            name: float(params['dur']) for name, params in metrics.items()
+        }
+        self.assertGreater(durations['serializer'], 0)
+        self.assertLessEqual(durations['db'], durations['view'])
+        self.assertLessEqual(
+            durations['view'] + durations['render'], durations['total']
+        )
+
+    def test_logs_timings_as_json(self):
+        with self.assertLogs('core.middleware', 'INFO') as logs:
+            res = self.client.get(ME_URL)
+
+        self.assertIn('Server-Timing', res)
+        fields = json.loads(logs.records[0].getMessage().split(' ', 2)[2])
+        self.assertEqual(fields, logs.records[0].server_timing)
+        self.assertEqual(fields['method'], 'GET')
+        self.assertEqual(fields['path'], ME_URL)
+        self.assertEqual(fields['view'], 'user:me')
+        self.assertEqual(fields['status'], 200)
+        for name in ['db_ms', 'view_ms', 'total_ms', 'queries']:
+            self.assertIn(name, fields)
+
+    def test_log_lines_are_handled(self):
+        '''test the timing log is not dropped without a LOGGING setup'''
+        logger = logging.getLogger('core.middleware')
+
+        self.assertTrue(logger.isEnabledFor(logging.INFO))
+        self.assertTrue(logger.handlers)
+
+    def test_other_routes_are_not_timed(self):
+        res = self.client.get(reverse('api-schema'))
+
+        self.assertNotIn('Server-Timing', res)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_disabled_by_zero_rate(self):
+        res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0.25)
+    def test_samples_share_of_requests(self):
+        with patch('core.middleware.random.random', return_value=0.3):
+            res = self.client.get(RECIPES_URL)
+        self.assertNotIn('Server-Timing', res)
+
+        with patch('core.middleware.random.random', return_value=0.2):
+            res = self.client.get(RECIPES_URL)
+        self.assertIn('Server-Timing', res)
+
+    def test_unresolved_path_has_no_view_timing(self):
+        res = self.client.get('/api/recipe/missing/')
+
+        self.assertEqual(res.status_code, 404)
+        metrics = parse_server_timing(res['Server-Timing'])
+        self.assertNotIn('view', metrics)
+        self.assertIn('total', metrics)
+
+
+class RequestTimingsTests(TestCase):
+    '''test spans of the request timings'''
+
+    def test_nested_spans_count_once(self):
+        timings = RequestTimings()
+        with patch('core.timing.time.perf_counter', side_effect=[0, 1, 2, 5]):
+            with timings.activate():
+                with timed('serializer'):
+                    with timed('serializer'):
+                        with timed('other'):
+                            pass
+
+        self.assertEqual(timings.spans['serializer'], 5)
+        self.assertEqual(timings.spans['other'], 1)
+
+    def test_timed_outside_request_is_noop(self):
+        with timed('serializer'):
+            pass
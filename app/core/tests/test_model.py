@@ -3,6 +3,7 @@ Testing user model
 '''
 from unittest.mock import patch
 from decimal import Decimal
+from django.db import IntegrityError
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
@@ -72,6 +73,45 @@ class ModelTest(TestCase):
 
         self.assertEqual(str(recipe), recipe.title)
 
+    def test_recipe_timestamps(self):
+        '''test recipes record creation and update times'''
+        user = create_user()
+        recipe = models.Recipe.objects.create(
+            user=user,
+            title='Sample title',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        created_at = recipe.created_at
+        updated_at = recipe.updated_at
+
+        recipe.title = 'New title'
+        recipe.save()
+
+        self.assertEqual(recipe.created_at, created_at)
+        self.assertGreater(recipe.updated_at, updated_at)
+
+    def test_linking_tag_touches_recipe(self):
+        '''test changing a recipe's tags updates its timestamp'''
+        user = create_user()
+        recipe = models.Recipe.objects.create(
+            user=user,
+            title='Sample title',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        tag = models.Tag.objects.create(user=user, name='tag1')
+        updated_at = recipe.updated_at
+
+        tag.recipe_set.add(recipe)
+        recipe.refresh_from_db()
+        self.assertGreater(recipe.updated_at, updated_at)
+
+        updated_at = recipe.updated_at
+        tag.delete()
+        recipe.refresh_from_db()
+        self.assertGreater(recipe.updated_at, updated_at)
+
     def test_create_tag(self):
         '''test creating a tag is succesfull'''
         user = create_user()
@@ -79,6 +119,16 @@ class ModelTest(TestCase):
 
         self.assertEqual(str(tag), tag.name)
 
+    def test_tag_name_unique_per_user(self):
+        '''test a user cannot have two tags with the same name'''
+        user = create_user()
+        other = create_user(email='other@example.com')
+        models.Tag.objects.create(user=user, name='tag1')
+        models.Tag.objects.create(user=other, name='tag1')
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='tag1')
+
     def test_create_ingredient(self):
         '''test creating ingredient successfull'''
 
@@ -90,6 +140,14 @@ class ModelTest(TestCase):
 
         self.assertEqual(str(ingredient), ingredient.name)
 
+    def test_ingredient_name_unique_per_user(self):
+        '''test a user cannot have two ingredients with the same name'''
+        user = create_user()
+        models.Ingredient.objects.create(user=user, name='Salt')
+
+        with self.assertRaises(IntegrityError):
+            models.Ingredient.objects.create(user=user, name='Salt')
+
     @patch('core.models.uuid.uuid4')
     def test_recipe_filename_uuid(self, mock_uuid):
         uuid = 'test-uuid'
@@ -0,0 +1,49 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from core.models import Recipe
+from core.storage import ContentAddressedStorage
+
+
+class ContentAddressedStorageTests(SimpleTestCase):
+    '''test files are stored once per distinct content'''
+
+    def setUp(self):
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        self.storage = ContentAddressedStorage(location=location.name)
+
+    def test_name_is_content_hash(self):
+        name = self.storage.save(
+            'uploads/recipe/photo.JPG', ContentFile(b'abc')
+        )
+
+        digest = (
+            'ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad'
+        )
+        self.assertEqual(name, f'uploads/recipe/ba/{digest}.jpg')
+        with self.storage.open(name) as f:
+            self.assertEqual(f.read(), b'abc')
+
+    def test_duplicates_share_one_file(self):
+        first = self.storage.save('uploads/recipe/a.jpg', ContentFile(b'x'))
+        second = self.storage.save('uploads/recipe/b.jpg', ContentFile(b'x'))
+        other = self.storage.save('uploads/recipe/c.jpg', ContentFile(b'y'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        _, files = self.storage.listdir(os.path.dirname(first))
+        self.assertEqual(len(files), 1)
+
+    def test_recipe_images_use_configured_storage(self):
+        field = Recipe._meta.get_field('image')
+        with patch.object(field, 'storage', self.storage):
+            recipe = Recipe(title='recipe', time_minutes=5)
+            recipe.image.save('photo.png', ContentFile(b'png'), save=False)
+
+        self.assertTrue(self.storage.exists(recipe.image.name))
+        self.assertTrue(recipe.image.name.startswith('uploads/recipe/'))
@@ -0,0 +1,92 @@
+'''per request timings of database queries, serializers and views
+
+The ServerTimingMiddleware activates a RequestTimings for the requests it
+samples; code elsewhere adds to it through timed(), which does nothing
+outside a sampled request.
+'''
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    '''seconds spent per named span and in the queries of a request'''
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.spans = defaultdict(float)
+        self._open = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        '''execute wrapper timing every query of the connection'''
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db += time.perf_counter() - start
+
+    @contextmanager
+    def span(self, name):
+        '''add the time taken to name, once however deeply nested'''
+        if name in self._open:
+            yield
+            return
+        self._open.add(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans[name] += time.perf_counter() - start
+            self._open.discard(name)
+
+    @contextmanager
+    def activate(self):
+        '''make these the timings timed() adds to'''
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    '''time the block as name in the timings of the current request'''
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    with timings.span(name):
+        yield
+
+
+class TimedSerializerMixin:
+    '''count validation and representation as serializer time
+
+    data covers serializers overriding to_representation, while
+    to_representation covers the children of plain list serializers.
+    '''
+
+    def is_valid(self, raise_exception=False):
+        with timed('serializer'):
+            return super().is_valid(raise_exception=raise_exception)
+
+    @property
+    def data(self):
+        with timed('serializer'):
+            return super().data
+
+    def to_representation(self, instance):
+        # called for every nested object, skip the context manager when
+        # the request is not sampled
+        timings = _current.get()
+        if timings is None:
+            return super().to_representation(instance)
+        with timings.span('serializer'):
+            return super().to_representation(instance)
@@ -1,3 +1,27 @@
-from django.shortcuts import render  # noqa
+'''views shared by the apis'''
+import ipaddress
 
-# Create your views here.
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+from core.metrics import export_metrics, metrics_enabled
+
+
+def _scraper_allowed(request):
+    '''whether the client address is in METRICS_ALLOWED_IPS'''
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(allowed, strict=False)
+        for allowed in settings.METRICS_ALLOWED_IPS
+    )
+
+
+def metrics(request):
+    '''prometheus metrics of this process, or of every worker'''
+    if not metrics_enabled() or not _scraper_allowed(request):
+        raise Http404
+    body, content_type = export_metrics()
+    return HttpResponse(body, content_type=content_type)
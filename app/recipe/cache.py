@@ -0,0 +1,94 @@
+'''per-user caching of recipe api list responses'''
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from rest_framework.response import Response
+
+from core.metrics import record_cache_lookup
+from core.models import Recipe
+
+
+def _version_key(user_id):
+    return f'recipe:user-version:{user_id}'
+
+
+def get_user_version(user_id):
+    '''return the current cache version of a user's recipe data'''
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # start from a fresh number so entries written under a version
+        # that was evicted can never be served again
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_user_version(user_id):
+    '''invalidate every cached list response of a user'''
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        cache.add(_version_key(user_id), time.time_ns(), timeout=None)
+
+
+def _digest(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def request_digest(request):
+    '''hash the absolute path and the order-insensitive query params'''
+    params = sorted(
+        (name, value)
+        for name, values in request.query_params.lists()
+        for value in values
+    )
+    return _digest(request.build_absolute_uri(request.path), params)
+
+
+def make_etag(*parts):
+    '''return a weak ETag derived from parts'''
+    return f'W/"{_digest(*parts)}"'
+
+
+def list_cache_key(request, basename):
+    '''build the cache key for a list request of the authenticated user'''
+    version = get_user_version(request.user.id)
+    return (
+        f'recipe:list:{basename}:{request.user.id}:{version}:'
+        f'{request_digest(request)}'
+    )
+
+
+def recipe_stats(user_id):
+    '''newest update and count of a user's recipes, cached until changed
+
+    The aggregate over the user's rows is served by recipe_user_updated_idx
+    and shared by every page and filter of their lists.
+    '''
+    key = f'recipe:stats:{user_id}:{get_user_version(user_id)}'
+    stats = cache.get(key)
+    record_cache_lookup('recipe_stats', stats is not None)
+    if stats is None:
+        stats = Recipe.objects.filter(user_id=user_id).aggregate(
+            last_update=Max('updated_at'), total=Count('id'),
+        )
+        cache.set(key, stats, settings.RECIPE_LIST_CACHE_TIMEOUT)
+    return stats
+
+
+class CachedListMixin:
+    '''serve list responses from the cache until the user's data changes'''
+
+    def list(self, request, *args, **kwargs):
+        key = list_cache_key(request, self.basename)
+        data = cache.get(key)
+        record_cache_lookup('list', data is not None)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        cache.set(key, response.data, settings.RECIPE_LIST_CACHE_TIMEOUT)
+        return response
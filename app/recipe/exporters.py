@@ -0,0 +1,55 @@
+'''streaming export of recipes'''
+import csv
+import json
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from recipe.serializers import RecipeRowsSerializer
+from recipe.utils import chunked
+
+
+EXPORT_CHUNK_SIZE = 500
+CSV_COLUMNS = [
+    'id', 'title', 'time_minutes', 'price', 'link', 'tags', 'ingredients',
+]
+
+
+class Echo:
+    '''file-like object handing back what is written to it'''
+
+    def write(self, value):
+        return value
+
+
+def iter_recipe_data(queryset, chunk_size=None):
+    '''yield serialized recipes read through a server side cursor
+
+    The queryset yields .values() rows, tags and ingredients are loaded
+    per chunk.
+    '''
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    for chunk in chunked(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        yield from RecipeRowsSerializer(chunk).data
+
+
+def iter_ndjson(queryset, chunk_size=None):
+    '''yield recipes as JSON Lines'''
+    for data in iter_recipe_data(queryset, chunk_size):
+        yield json.dumps(data, cls=JSONEncoder) + '\n'
+
+
+def iter_csv(queryset, chunk_size=None):
+    '''yield recipes as CSV rows, tag and ingredient names joined by |'''
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for data in iter_recipe_data(queryset, chunk_size):
+        row = dict(data)
+        for attr in ['tags', 'ingredients']:
+            row[attr] = '|'.join(item['name'] for item in data[attr])
+        yield writer.writerow([row[column] for column in CSV_COLUMNS])
+
+
+EXPORT_FORMATS = {
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+    'csv': (iter_csv, 'text/csv'),
+}
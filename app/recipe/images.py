@@ -0,0 +1,153 @@
+'''background processing of uploaded recipe images
+
+Every upload is recorded as an ImageJob in the transaction that stages
+it and handed to an in-process worker pool once committed. The row is
+deleted when the job finishes either way, so rows left behind belong to
+jobs a restart lost; gc_images retries those.
+'''
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core.models import ImageJob, Recipe
+
+
+logger = logging.getLogger(__name__)
+
+STAGING_DIR = os.path.join('uploads', 'staging')
+THUMBNAIL_SIZE = (256, 256)
+
+_executor = None
+
+
+def _get_executor():
+    '''return the process-wide worker pool, creating it on first use'''
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.RECIPE_IMAGE_WORKERS,
+            thread_name_prefix='recipe-image',
+        )
+    return _executor
+
+
+def stage_upload(upload):
+    '''stream an uploaded file into the staging area and return its name'''
+    ext = os.path.splitext(upload.name)[1].lower()
+    return default_storage.save(
+        os.path.join(STAGING_DIR, f'{uuid.uuid4()}{ext}'), upload
+    )
+
+
+def set_image_status(recipe_id, image_status):
+    '''store the image status, moving updated_at so detail ETags change'''
+    Recipe.objects.filter(pk=recipe_id).update(
+        image_status=image_status, updated_at=timezone.now()
+    )
+
+
+def enqueue_image(recipe, staged_name):
+    '''mark the recipe pending and process the file once committed'''
+    recipe.image_status = Recipe.IMAGE_PENDING
+    set_image_status(recipe.pk, Recipe.IMAGE_PENDING)
+    job = ImageJob.objects.create(recipe=recipe, staged_name=staged_name)
+    transaction.on_commit(lambda: submit_image(job.pk))
+
+
+def submit_image(job_id):
+    '''hand a job to the worker pool, or process it inline'''
+    if settings.RECIPE_IMAGE_WORKERS:
+        _get_executor().submit(_run_job, job_id)
+    else:
+        run_job(job_id)
+
+
+def _run_job(job_id):
+    try:
+        run_job(job_id)
+    finally:
+        connections.close_all()
+
+
+def run_job(job_id):
+    '''process the staged file of a job and drop the job'''
+    job = ImageJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return
+    ImageJob.objects.filter(pk=job_id).update(
+        attempts=F('attempts') + 1, updated_at=timezone.now()
+    )
+    try:
+        process_image(job.recipe_id, job.staged_name)
+    except Exception:
+        logger.exception(
+            'processing image for recipe %s failed', job.recipe_id
+        )
+        set_image_status(job.recipe_id, Recipe.IMAGE_FAILED)
+    finally:
+        ImageJob.objects.filter(pk=job_id).delete()
+
+
+def _encode(image, max_size=None):
+    '''re-encode without metadata, keeping transparency when present'''
+    if max_size:
+        image = image.copy()
+        image.thumbnail(max_size)
+    out = BytesIO()
+    if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+        image.convert('RGBA').save(out, format='PNG', optimize=True)
+        return out.getvalue(), '.png'
+    image.convert('RGB').save(out, format='JPEG', quality=85, optimize=True)
+    return out.getvalue(), '.jpg'
+
+
+def thumbnail_name(name):
+    '''return the storage name of the thumbnail of an image'''
+    stem, ext = os.path.splitext(name)
+    return f'{stem}_thumb{ext}'
+
+
+def _load(staged_name):
+    '''open, verify and orient a staged image'''
+    with default_storage.open(staged_name, 'rb') as f:
+        Image.open(f).verify()
+    with default_storage.open(staged_name, 'rb') as f:
+        image = Image.open(f)
+        image.load()
+    return ImageOps.exif_transpose(image)
+
+
+def process_image(recipe_id, staged_name):
+    '''verify, strip EXIF, re-encode and thumbnail a staged upload'''
+    set_image_status(recipe_id, Recipe.IMAGE_PROCESSING)
+    try:
+        image = _load(staged_name)
+        content, ext = _encode(image)
+        thumbnail, _ = _encode(image, THUMBNAIL_SIZE)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.info('rejecting invalid image for recipe %s', recipe_id)
+        set_image_status(recipe_id, Recipe.IMAGE_FAILED)
+        return
+    finally:
+        default_storage.delete(staged_name)
+
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None:
+        return
+    recipe.image.save(f'image{ext}', ContentFile(content), save=False)
+    thumb_name = thumbnail_name(recipe.image.name)
+    # content addressed images may share the thumbnail of a duplicate
+    if not default_storage.exists(thumb_name):
+        default_storage.save(thumb_name, ContentFile(thumbnail))
+    recipe.image_status = Recipe.IMAGE_READY
+    recipe.save(update_fields=['image', 'image_status', 'updated_at'])
@@ -0,0 +1,114 @@
+'''bulk import of recipes from JSON Lines'''
+import json
+
+from django.db import DatabaseError, transaction
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.cache import bump_user_version
+from recipe.search import update_search_vectors
+from recipe.serializers import RecipeImportSerializer, get_or_create_by_name
+from recipe.utils import chunked, through_columns
+
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+class RecipeImporter:
+    '''validate and save NDJSON recipe rows for a user, chunk by chunk
+
+    Every chunk is written in its own transaction with bulk inserts for
+    recipes, tags, ingredients and their links. Invalid rows are reported
+    by line number and skipped without affecting the rest of the batch.
+    '''
+
+    def __init__(self, user, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.created = 0
+        self.errors = []
+
+    def run(self, lines):
+        '''import every line and return a summary report'''
+        numbered = (
+            (number, line)
+            for number, line in enumerate(lines, 1)
+            if line.strip()
+        )
+        for chunk in chunked(numbered, self.chunk_size):
+            self._import_chunk(chunk)
+        return {'created': self.created, 'errors': self.errors}
+
+    def _add_error(self, line, errors):
+        self.errors.append({'line': line, 'errors': errors})
+
+    def _validate(self, number, line):
+        '''return validated data for a line or record why it failed'''
+        try:
+            row = json.loads(line)
+        except ValueError:
+            self._add_error(number, {'non_field_errors': ['Invalid JSON.']})
+            return None
+        if not isinstance(row, dict):
+            self._add_error(
+                number, {'non_field_errors': ['Expected a JSON object.']}
+            )
+            return None
+        serializer = RecipeImportSerializer(data=row)
+        if not serializer.is_valid():
+            self._add_error(number, serializer.errors)
+            return None
+        return serializer.validated_data
+
+    def _import_chunk(self, chunk):
+        rows = []
+        numbers = []
+        for number, line in chunk:
+            data = self._validate(number, line)
+            if data is not None:
+                rows.append(data)
+                numbers.append(number)
+        if not rows:
+            return
+        try:
+            with transaction.atomic():
+                self._save(rows)
+        except DatabaseError as exc:
+            for number in numbers:
+                self._add_error(number, {'non_field_errors': [str(exc)]})
+            return
+        # bulk inserts send no model signals, so invalidate explicitly
+        bump_user_version(self.user.id)
+        self.created += len(rows)
+
+    def _save(self, rows):
+        '''bulk insert a chunk of validated rows'''
+        tags = [row.pop('tags', []) for row in rows]
+        ingredients = [row.pop('ingredients', []) for row in rows]
+        recipes = Recipe.objects.bulk_create(
+            [Recipe(user=self.user, **row) for row in rows]
+        )
+        self._link(Recipe.tags, Tag, recipes, tags)
+        self._link(Recipe.ingredients, Ingredient, recipes, ingredients)
+        update_search_vectors(pk__in=[recipe.id for recipe in recipes])
+        return recipes
+
+    def _link(self, descriptor, model, recipes, items_per_recipe):
+        '''create missing attributes and link them to their recipes'''
+        names = [
+            item['name'] for items in items_per_recipe for item in items
+        ]
+        by_name = {
+            obj.name: obj
+            for obj in get_or_create_by_name(model, self.user, names)
+        }
+        through = descriptor.through
+        source, target = through_columns(descriptor)
+        links = dict.fromkeys(
+            (recipe.id, by_name[item['name']].id)
+            for recipe, items in zip(recipes, items_per_recipe)
+            for item in items
+        )
+        through.objects.bulk_create([
+            through(**{source: recipe_id, target: obj_id})
+            for recipe_id, obj_id in links
+        ])
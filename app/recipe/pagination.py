@@ -0,0 +1,34 @@
+'''pagination for recipe apis'''
+from rest_framework.pagination import CursorPagination
+
+
+class OptInCursorPagination(CursorPagination):
+    '''keyset pagination applied only when the client asks for a page'''
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        '''return None (unpaginated) unless a cursor or page size is sent'''
+        params = request.query_params
+        if (self.cursor_query_param not in params and
+                self.page_size_query_param not in params):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        '''let the view order pages by annotations such as search rank'''
+        get_cursor_ordering = getattr(view, 'get_cursor_ordering', None)
+        if get_cursor_ordering is not None:
+            return get_cursor_ordering()
+        return super().get_ordering(request, queryset, view)
+
+
+class RecipeCursorPagination(OptInCursorPagination):
+    '''pages of recipes, newest first'''
+    ordering = '-id'
+
+
+class RecipeAttrCursorPagination(OptInCursorPagination):
+    '''pages of tags or ingredients ordered by name'''
+    ordering = ('-name', '-id')
@@ -0,0 +1,35 @@
+'''faster JSON rendering of recipe api responses'''
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# encodes what orjson leaves out, decimals and lazy strings for instance
+_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(JSONRenderer):
+    '''JSONRenderer producing the same bytes through orjson
+
+    Falls back to JSONRenderer when orjson is not installed or the client
+    asks for indented output.
+    '''
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or data is None or indent is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(
+            data,
+            default=_encoder.default,
+            # datetimes go through JSONEncoder, it trims microseconds
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+        # escaped like JSONRenderer so the output stays a javascript subset
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace(
+            '\u2029'.encode(), b'\\u2029'
+        )
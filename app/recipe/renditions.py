@@ -0,0 +1,70 @@
+'''resized renditions of recipe images, generated on first request'''
+import hashlib
+import os
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, features
+
+
+RENDITION_SIZES = (128, 512, 1024)
+RENDITION_CACHE_TIMEOUT = 60 * 60 * 24
+
+# format name in urls -> (Pillow format, file extension)
+_FORMATS = {
+    'jpeg': ('JPEG', '.jpg'),
+    'webp': ('WEBP', '.webp'),
+}
+# Pillow builds without libwebp can only write JPEG
+RENDITION_FORMATS = [
+    fmt for fmt in _FORMATS if fmt != 'webp' or features.check('webp')
+]
+
+
+def rendition_name(image_name, size, fmt):
+    '''return the storage name of a rendition, next to the original'''
+    stem = os.path.splitext(image_name)[0]
+    return f'{stem}_{size}{_FORMATS[fmt][1]}'
+
+
+def _cache_key(image_name, size, fmt):
+    digest = hashlib.md5(image_name.encode()).hexdigest()
+    return f'recipe:rendition:{digest}:{size}:{fmt}'
+
+
+def _render(image_name, size, fmt):
+    '''resize the original to fit size and encode it as fmt'''
+    with default_storage.open(image_name, 'rb') as f:
+        image = Image.open(f)
+        image.load()
+    image.thumbnail((size, size))
+    pil_format = _FORMATS[fmt][0]
+    if pil_format == 'JPEG':
+        if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+            # flatten onto white, JPEG has no alpha channel
+            rgba = image.convert('RGBA')
+            image = Image.new('RGB', rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.getchannel('A'))
+        else:
+            image = image.convert('RGB')
+    out = BytesIO()
+    image.save(out, format=pil_format, quality=80)
+    return out.getvalue()
+
+
+def get_rendition(image_name, size, fmt):
+    '''return the storage name of a rendition, generating it if missing'''
+    key = _cache_key(image_name, size, fmt)
+    name = cache.get(key)
+    if name is None:
+        name = rendition_name(image_name, size, fmt)
+        if not default_storage.exists(name):
+            # a concurrent request may win the race, storage then picks
+            # another free name and the loser's copy is cached instead
+            name = default_storage.save(
+                name, ContentFile(_render(image_name, size, fmt))
+            )
+        cache.set(key, name, RENDITION_CACHE_TIMEOUT)
+    return name
@@ -0,0 +1,130 @@
+'''full text search over recipes and typeahead over their attributes'''
+from functools import lru_cache
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import (
+    Case,
+    DecimalField,
+    Exists,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Cast, Upper
+
+from core.models import Recipe, Tag, Ingredient
+
+
+SEARCH_CONFIG = 'english'
+# ts_rank returns a float4, exact decimals keep cursor positions stable
+RANK_FIELD = DecimalField(max_digits=12, decimal_places=8)
+
+
+def search_supported(using=DEFAULT_DB_ALIAS):
+    '''whether the database can maintain and query search vectors'''
+    return connections[using].vendor == 'postgresql'
+
+
+def _names(model):
+    '''space separated names of the model objects linked to a recipe'''
+    return Subquery(
+        model.objects.filter(recipe=OuterRef('pk'))
+        .values('recipe')
+        .annotate(names=StringAgg('name', ' '))
+        .values('names')
+    )
+
+
+def search_vector():
+    '''weighted vector of title, tag and ingredient names, description'''
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+        SearchVector(_names(Tag), weight='B', config=SEARCH_CONFIG) +
+        SearchVector(_names(Ingredient), weight='B', config=SEARCH_CONFIG) +
+        SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(**filters):
+    '''recompute the stored search vector of matching recipes'''
+    if search_supported():
+        Recipe.objects.filter(**filters).update(search_vector=search_vector())
+
+
+def _contains_name(descriptor, text):
+    '''EXISTS a linked tag or ingredient whose name contains text'''
+    field = descriptor.field
+    return Exists(descriptor.through.objects.filter(**{
+        f'{field.m2m_field_name()}_id': OuterRef('pk'),
+        f'{field.m2m_reverse_field_name()}__name__icontains': text,
+    }))
+
+
+def search_recipes(queryset, text):
+    '''filter recipes matching text and annotate their rank'''
+    if not search_supported(queryset.db):
+        # substring match for databases without full text search, the
+        # constant rank is cast in SQL as SQLite hands decimal parameters
+        # back as strings its converter rejects
+        return queryset.filter(
+            Q(title__icontains=text) |
+            Q(description__icontains=text) |
+            _contains_name(Recipe.tags, text) |
+            _contains_name(Recipe.ingredients, text)
+        ).annotate(rank=Cast(Value(0), RANK_FIELD))
+    query = SearchQuery(text, search_type='websearch', config=SEARCH_CONFIG)
+    return queryset.filter(search_vector=query).annotate(
+        rank=Cast(SearchRank(F('search_vector'), query), RANK_FIELD)
+    )
+
+
+@lru_cache(maxsize=None)
+def _trigram_installed(database):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def trigram_supported():
+    '''whether pg_trgm is installed, checked once per database'''
+    return (
+        search_supported() and
+        _trigram_installed(connection.settings_dict['NAME'])
+    )
+
+
+def typeahead(queryset, text):
+    '''filter names starting with or resembling text, best first
+
+    Names are compared upper cased so the UPPER(name) trigram indexes
+    serve both the prefix and the similarity match.
+    '''
+    text = text.upper()
+    queryset = queryset.annotate(
+        upper_name=Upper('name'),
+        is_prefix=Case(
+            When(upper_name__startswith=text, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+    )
+    if not trigram_supported():
+        return queryset.filter(upper_name__contains=text).order_by(
+            '-is_prefix', 'name'
+        )
+    return queryset.filter(
+        Q(upper_name__startswith=text) | Q(upper_name__trigram_similar=text)
+    ).annotate(
+        similarity=TrigramSimilarity('upper_name', text),
+    ).order_by('-is_prefix', '-similarity', 'name')
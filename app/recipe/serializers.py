@@ -1,11 +1,60 @@
 '''Serializers for recipe apis'''
+from collections import defaultdict
 
+from django.conf import settings
+from django.urls import reverse
+from drf_spectacular.utils import extend_schema_field, OpenApiTypes
 from rest_framework import serializers
 
-from core.models import Recipe, Tag, Ingredient
+from core.models import ImageUpload, Recipe, Tag, Ingredient
+from core.timing import TimedSerializerMixin
+from recipe.renditions import RENDITION_FORMATS, RENDITION_SIZES
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+# many to many fields serialized as lists of {id, name}
+RELATED_FIELDS = ['tags', 'ingredients']
+
+
+def get_or_create_by_name(model, user, names):
+    '''return the user's objects for names, bulk creating missing ones'''
+    names = list(dict.fromkeys(names))
+    if not names:
+        return []
+    found = {
+        obj.name: obj
+        for obj in model.objects.filter(user=user, name__in=names)
+    }
+    missing = [name for name in names if name not in found]
+    if missing:
+        # rows created concurrently are skipped by the unique constraint
+        # and picked up by the second lookup
+        model.objects.bulk_create(
+            [model(user=user, name=name) for name in missing],
+            ignore_conflicts=True,
+        )
+        found.update(
+            (obj.name, obj)
+            for obj in model.objects.filter(user=user, name__in=missing)
+        )
+    return [found[name] for name in names]
+
+
+def rendition_urls(pk, image, request=None):
+    '''map of rendition size to format to url, {} without an image'''
+    if not image:
+        return {}
+    images = {}
+    for size in RENDITION_SIZES:
+        images[str(size)] = {}
+        for fmt in RENDITION_FORMATS:
+            url = reverse('recipe:recipe-rendition', args=[pk, size, fmt])
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            images[str(size)][fmt] = url
+    return images
+
+
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     '''Serizalizers for Ingredients'''
 
     class Meta:
@@ -14,7 +63,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     '''Serializer for tags'''
 
     class Meta:
@@ -23,46 +72,72 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class CompactAttrSerializer(TimedSerializerMixin, serializers.BaseSerializer):
+    '''[id, name] pairs of tags or ingredients for autocomplete'''
+
+    def to_representation(self, instance):
+        return [instance.id, instance.name]
+
+
+class SparseFieldsMixin:
+    '''drop the fields not named in the fields keyword argument'''
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class RecipeSerializer(
+        TimedSerializerMixin, SparseFieldsMixin,
+        serializers.ModelSerializer):
     '''serializer for recipes'''
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = [
             'id', 'title', 'time_minutes', 'price', 'link', 'tags',
-            'ingredients',
+            'ingredients', 'images',
         ]
         read_only_fields = ['id']
 
-    def _get_or_create_tag(self, tags, recipe):
-        '''handle getting or creating tags as added'''
+    @extend_schema_field(OpenApiTypes.OBJECT)
+    def get_images(self, recipe):
+        '''map of rendition size to format to url, {} without an image'''
+        return rendition_urls(
+            recipe.pk, recipe.image, self.context.get('request')
+        )
+
+    def _get_or_create_tag(self, tags):
+        '''return tags named in the payload, creating missing ones'''
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag
-            )
-            recipe.tags.add(tag_obj)
+        return get_or_create_by_name(
+            Tag, auth_user, [tag['name'] for tag in tags]
+        )
 
-    def _get_or_create_ingredients(self, ingredients, recipe):
-        '''handle getting or creating ingredients as needed'''
+    def _get_or_create_ingredients(self, ingredients):
+        '''return ingredients named in the payload, creating missing ones'''
         auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, create = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient
-            )
-            recipe.ingredients.add(ingredient_obj)
+        return get_or_create_by_name(
+            Ingredient, auth_user,
+            [ingredient['name'] for ingredient in ingredients]
+        )
 
     def create(self, validated_data):
         '''create a recipe'''
         tags = validated_data.pop('tags', [])
         ingredients = validated_data.pop('ingredients', [])
         recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tag(tags, recipe)
-        self._get_or_create_ingredients(ingredients, recipe)
+        if tags:
+            recipe.tags.add(*self._get_or_create_tag(tags))
+        if ingredients:
+            recipe.ingredients.add(
+                *self._get_or_create_ingredients(ingredients)
+            )
         return recipe
 
     def update(self, instance, validated_data):
@@ -70,11 +145,11 @@ class RecipeSerializer(serializers.ModelSerializer):
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tag(tags, instance)
+            instance.tags.set(self._get_or_create_tag(tags))
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+            instance.ingredients.set(
+                self._get_or_create_ingredients(ingredients)
+            )
         for attr, val in validated_data.items():
             setattr(instance, attr, val)
 
@@ -82,17 +157,107 @@ class RecipeSerializer(serializers.ModelSerializer):
         return instance
 
 
+class RecipeRowsSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    '''read only RecipeSerializer(many=True) over .values() rows
+
+    Rows are turned into dicts directly instead of going through every
+    field of every recipe, tags and ingredients are read with one query
+    per relation. Rows carry id and the columns of the selected fields.
+    '''
+
+    def __init__(self, *args, fields=None, **kwargs):
+        kwargs.setdefault('child', RecipeSerializer(fields=fields))
+        super().__init__(*args, **kwargs)
+
+    def _related(self, name, recipe_ids):
+        '''map recipe id to the serialized tags or ingredients linked'''
+        field = getattr(Recipe, name).field
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        related = defaultdict(list)
+        links = (
+            field.remote_field.through.objects
+            .filter(**{f'{source}_id__in': recipe_ids})
+            .order_by(f'{target}_id')
+            .values_list(f'{source}_id', f'{target}_id', f'{target}__name')
+        )
+        for recipe_id, obj_id, obj_name in links:
+            related[recipe_id].append({'id': obj_id, 'name': obj_name})
+        return related
+
+    def _getters(self, rows):
+        '''(name, function of a row) for every field of the child'''
+        recipe_ids = [row['id'] for row in rows]
+        request = self.context.get('request')
+        getters = []
+        for name, field in self.child.fields.items():
+            if name in RELATED_FIELDS:
+                related = self._related(name, recipe_ids)
+                getters.append(
+                    (name, lambda row, related=related: related[row['id']])
+                )
+            elif name == 'images':
+                getters.append((name, lambda row: rendition_urls(
+                    row['id'], row['image'], request
+                )))
+            else:
+                getters.append((name, lambda row, name=name, field=field: (
+                    None if row[name] is None
+                    else field.to_representation(row[name])
+                )))
+        return getters
+
+    def to_representation(self, data):
+        rows = list(data)
+        if not rows:
+            return []
+        getters = self._getters(rows)
+        return [
+            {name: get(row) for name, get in getters}
+            for row in rows
+        ]
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     '''serializer for recipe detail'''
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description', 'image']
+        fields = RecipeSerializer.Meta.fields + [
+            'description', 'image', 'image_status',
+        ]
+        read_only_fields = RecipeSerializer.Meta.read_only_fields + [
+            'image_status',
+        ]
+
+
+class RecipeImportSerializer(RecipeSerializer):
+    '''serializer validating rows of a bulk recipe import'''
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ['description']
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class RecipeImageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     '''serializers for uploading images'''
+    # the upload is only staged here, the worker verifies it is an image
+    image = serializers.FileField()
 
     class Meta:
         model = Recipe
-        fields = ['id', 'image']
-        read_only_fields = ['id']
-        extra_kwargs = {'image': {'required': 'True'}}
+        fields = ['id', 'image', 'image_status']
+        read_only_fields = ['id', 'image_status']
+
+
+class ImageUploadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    '''serializer for resumable image uploads'''
+
+    class Meta:
+        model = ImageUpload
+        fields = ['id', 'filename', 'size', 'received']
+        read_only_fields = ['id', 'received']
+
+    def validate_size(self, value):
+        max_size = settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE
+        if not 0 < value <= max_size:
+            raise serializers.ValidationError(
+                f'Ensure the size is between 1 and {max_size} bytes.'
+            )
+        return value
@@ -0,0 +1,110 @@
+'''signal handlers keeping recipe timestamps and caches in step'''
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.cache import bump_user_version
+from recipe.search import update_search_vectors
+
+
+SEARCH_FIELDS = {'title', 'description'}
+
+
+def touch_recipes(**filters):
+    '''mark matching recipes as updated now'''
+    Recipe.objects.filter(**filters).update(updated_at=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=Tag)
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_user_lists(sender, instance, **kwargs):
+    '''drop cached lists of the owner of a changed object'''
+    bump_user_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_user_lists_on_links(sender, instance, action, **kwargs):
+    '''drop cached lists when tags or ingredients are (un)linked'''
+    if action.startswith('post_'):
+        bump_user_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_recipes_on_links(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    '''mark recipes whose tags or ingredients changed as updated'''
+    if not reverse:
+        if action.startswith('post_'):
+            touch_recipes(pk=instance.pk)
+    elif action in ['post_add', 'post_remove']:
+        touch_recipes(pk__in=pk_set)
+    elif action == 'pre_clear':
+        touch_recipes(pk__in=instance.recipe_set.values('pk'))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def touch_recipes_on_attr_change(sender, instance, created=False, **kwargs):
+    '''mark recipes showing a renamed or deleted tag/ingredient as updated'''
+    if not created:
+        touch_recipes(pk__in=instance.recipe_set.values('pk'))
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, update_fields=None, **kwargs):
+    '''refresh the search vector when searchable text changed'''
+    if update_fields is None or SEARCH_FIELDS & set(update_fields):
+        update_search_vectors(pk=instance.pk)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def index_recipes_on_links(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    '''refresh search vectors of recipes whose tags/ingredients changed'''
+    if not reverse:
+        if action.startswith('post_'):
+            update_search_vectors(pk=instance.pk)
+    elif action in ['post_add', 'post_remove']:
+        update_search_vectors(pk__in=pk_set)
+    elif action == 'pre_clear':
+        instance._unlinked_recipe_ids = list(
+            instance.recipe_set.values_list('pk', flat=True)
+        )
+    elif action == 'post_clear':
+        update_search_vectors(pk__in=instance._unlinked_recipe_ids)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def index_recipes_on_rename(sender, instance, created, **kwargs):
+    '''refresh search vectors of recipes showing a renamed name'''
+    if not created:
+        update_search_vectors(pk__in=instance.recipe_set.values('pk'))
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_indexed_recipes(sender, instance, **kwargs):
+    '''note linked recipes, their links are gone once deleted'''
+    instance._unlinked_recipe_ids = list(
+        instance.recipe_set.values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def index_recipes_on_delete(sender, instance, **kwargs):
+    '''drop the name of a deleted tag/ingredient from search vectors'''
+    update_search_vectors(pk__in=instance._unlinked_recipe_ids)
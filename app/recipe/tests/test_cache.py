@@ -0,0 +1,162 @@
+'''tests for cached recipe api list responses'''
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def create_recipe(user, **params):
+    '''create and return sample recipe'''
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class CachedListTests(TestCase):
+    '''test list responses are cached per user and invalidated on writes'''
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_repeated_list_served_from_cache(self):
+        '''test a second identical list request runs no queries'''
+        create_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(RECIPE_URL)
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.data, res.data)
+
+    def test_query_params_cached_separately(self):
+        '''test differently filtered lists do not share an entry'''
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        create_recipe(user=self.user).tags.add(tag)
+        create_recipe(user=self.user)
+
+        res = self.client.get(RECIPE_URL)
+        filtered = self.client.get(RECIPE_URL, {'tags': str(tag.id)})
+
+        self.assertEqual(len(res.data), 2)
+        self.assertEqual(len(filtered.data), 1)
+
+    def test_cache_is_per_user(self):
+        '''test users never see each other's cached lists'''
+        create_recipe(user=self.user)
+        self.client.get(RECIPE_URL)
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'testpass123'
+        )
+        self.client.force_authenticate(other)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data, [])
+
+    def test_recipe_writes_invalidate(self):
+        '''test creating, updating and deleting recipes refresh the list'''
+        recipe = create_recipe(user=self.user, title='first')
+        self.client.get(RECIPE_URL)
+
+        create_recipe(user=self.user, title='second')
+        self.assertEqual(len(self.client.get(RECIPE_URL).data), 2)
+
+        recipe.title = 'renamed'
+        recipe.save()
+        titles = [r['title'] for r in self.client.get(RECIPE_URL).data]
+        self.assertIn('renamed', titles)
+
+        recipe.delete()
+        self.assertEqual(len(self.client.get(RECIPE_URL).data), 1)
+
+    def test_linking_tags_invalidates(self):
+        '''test adding a tag to a recipe refreshes recipe and tag lists'''
+        recipe = create_recipe(user=self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(RECIPE_URL)
+        self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        recipe.tags.add(tag)
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(
+            res.data[0]['tags'], [{'id': tag.id, 'name': 'Vegan'}]
+        )
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+        self.assertEqual(len(res.data), 1)
+
+    def test_renaming_ingredient_invalidates(self):
+        '''test renaming an ingredient refreshes lists that embed it'''
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        create_recipe(user=self.user).ingredients.add(ingredient)
+        self.client.get(RECIPE_URL)
+        self.client.get(INGREDIENTS_URL)
+
+        ingredient.name = 'Sea salt'
+        ingredient.save()
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data[0]['ingredients'][0]['name'], 'Sea salt')
+        res = self.client.get(INGREDIENTS_URL)
+        self.assertEqual(res.data[0]['name'], 'Sea salt')
+
+    def test_api_writes_invalidate(self):
+        '''test writes made through the api refresh the list'''
+        self.client.get(RECIPE_URL)
+        payload = {
+            'title': 'Soup',
+            'time_minutes': 10,
+            'price': '2.50',
+            'tags': [{'name': 'Hot'}],
+        }
+        self.client.post(RECIPE_URL, payload, format='json')
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]['tags'][0]['name'], 'Hot')
+
+    def test_bulk_import_invalidates(self):
+        '''test recipes added by bulk import show up in the list'''
+        self.client.get(RECIPE_URL)
+        self.client.post(
+            reverse('recipe:recipe-bulk'),
+            '{"title": "Soup", "time_minutes": 10, "price": "2.50"}',
+            content_type='application/x-ndjson',
+        )
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(res.data), 1)
+
+    def test_evicted_version_does_not_revive_stale_entries(self):
+        '''test losing the version counter never serves old entries'''
+        create_recipe(user=self.user, title='first')
+        self.client.get(RECIPE_URL)
+        cache.delete(f'recipe:user-version:{self.user.id}')
+        Recipe.objects.filter(user=self.user).update(title='changed')
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data[0]['title'], 'changed')
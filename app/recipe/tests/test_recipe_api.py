@@ -1,20 +1,48 @@
 '''
 Test for recipe APIs
 '''
+import csv
+import io
+import json
 import tempfile
 import os
+from unittest import skipUnless
+from unittest.mock import patch
 from PIL import Image
 
 from decimal import Decimal
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.db.models import Prefetch
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
-from rest_framework.test import APIClient
-
-from core.models import Recipe, Tag, Ingredient
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.models import (
+    ImageUpload,
+    ImageUploadChunk,
+    Recipe,
+    Tag,
+    Ingredient,
+)
 
+from recipe.images import THUMBNAIL_SIZE, process_image, thumbnail_name
+from recipe.pagination import RecipeCursorPagination
+from recipe.renditions import (
+    RENDITION_FORMATS,
+    RENDITION_SIZES,
+    rendition_name,
+)
+from recipe.uploads import discard_upload
+from recipe.views import RecipeViewSet
 from recipe.serializers import (
     RecipeSerializer,
     RecipeDetailSerializer,
@@ -22,6 +50,8 @@ from recipe.serializers import (
 
 
 RECIPE_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+EXPORT_URL = reverse('recipe:recipe-export')
 
 
 def image_upload_url(recipe_id):
@@ -29,6 +59,11 @@ def image_upload_url(recipe_id):
     return reverse('recipe:recipe-upload-image', args=[recipe_id])
 
 
+def rendition_url(recipe_id, size, fmt):
+    '''create and return the url of a recipe image rendition'''
+    return reverse('recipe:recipe-rendition', args=[recipe_id, size, fmt])
+
+
 def detail_url(recipe_id):
     '''create and return a recipe detail url'''
     return reverse('recipe:recipe-detail', args=[recipe_id])
@@ -462,7 +497,939 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(s2.data, res.data)
         self.assertNotIn(s3.data, res.data)
 
+    def test_filter_by_all_tags(self):
+        '''test match=all keeps recipes carrying every requested tag'''
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Quick')
+        r1 = create_recipe(user=self.user, title='both')
+        r1.tags.add(tag1, tag2)
+        r2 = create_recipe(user=self.user, title='one')
+        r2.tags.add(tag1)
+
+        params = {'tags': f'{tag1.id},{tag2.id}', 'match': 'all'}
+        res = self.client.get(RECIPE_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data], [r1.id])
+
+    def test_filter_matching_many_tags_returns_recipe_once(self):
+        '''test a recipe matching several tags is listed once'''
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Quick')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(tag1, tag2)
+
+        res = self.client.get(RECIPE_URL, {'tags': f'{tag1.id},{tag2.id}'})
+
+        self.assertEqual([r['id'] for r in res.data], [recipe.id])
+
+    def test_filter_invalid_match(self):
+        '''test an unknown match mode is rejected'''
+        res = self.client.get(RECIPE_URL, {'tags': '1', 'match': 'some'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def _list_queryset(self, params):
+        '''return the queryset the list action builds for params'''
+        request = Request(APIRequestFactory().get(RECIPE_URL, params))
+        request.user = self.user
+        view = RecipeViewSet(action='list', request=request)
+        return view.get_queryset()
+
+    def test_filter_plans_have_no_distinct(self):
+        '''test filters use EXISTS and the plan has no de-duplication'''
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        for match in ['any', 'all']:
+            queryset = self._list_queryset({
+                'tags': f'{tag.id},{tag.id + 1}',
+                'ingredients': str(ingredient.id),
+                'match': match,
+            })
+
+            self.assertFalse(queryset.query.distinct)
+            self.assertIn('EXISTS', str(queryset.query))
+            plan = queryset.explain()
+            self.assertNotIn('Unique', plan)
+            self.assertNotIn('HashAggregate', plan)
+
+
+class RecipeQueryCountTests(TestCase):
+    '''test recipe endpoints run a constant number of queries'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpassword123')
+        self.client.force_authenticate(self.user)
+
+    def _create_recipes(self, count):
+        '''create recipes each carrying their own tags and ingredients'''
+        recipes = []
+        for i in range(count):
+            recipe = create_recipe(user=self.user, title=f'recipe {i}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'tag {i}'),
+                Tag.objects.create(user=self.user, name=f'tag {i} extra'),
+            )
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f'ing {i}'),
+                Ingredient.objects.create(user=self.user, name=f'ing {i} b'),
+            )
+            recipes.append(recipe)
+        return recipes
+
+    def test_list_query_count_is_constant(self):
+        '''test listing recipes does not query per recipe'''
+        self._create_recipes(10)
+
+        # ETag stats of the user, recipes, tags, ingredients
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 10)
+        self.assertEqual(len(res.data[0]['tags']), 2)
+        self.assertEqual(len(res.data[0]['ingredients']), 2)
+
+    def test_filtered_list_query_count_is_constant(self):
+        '''test filtering recipes does not query per recipe'''
+        recipes = self._create_recipes(5)
+        tag_ids = ','.join(str(r.tags.first().id) for r in recipes)
+
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPE_URL, {'tags': tag_ids})
+
+        self.assertEqual(len(res.data), 5)
+
+    def test_detail_query_count_is_constant(self):
+        '''test retrieving a recipe prefetches tags and ingredients'''
+        recipe = self._create_recipes(1)[0]
+
+        with self.assertNumQueries(3):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # tags and ingredients are listed in id order
+        recipe = Recipe.objects.prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch(
+                'ingredients', queryset=Ingredient.objects.order_by('id')
+            ),
+        ).get(pk=recipe.pk)
+        self.assertEqual(res.data, RecipeDetailSerializer(recipe).data)
+
+    def test_list_defers_unserialized_columns(self):
+        '''test list does not load detail-only columns'''
+        self._create_recipes(1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(RECIPE_URL)
+
+        recipe_sql = next(
+            q['sql'] for q in ctx.captured_queries if 'ORDER BY' in q['sql']
+        )
+        self.assertNotIn('"description"', recipe_sql)
+        self.assertNotIn('"image_status"', recipe_sql)
+
+    def _count_create_queries(self, ingredient_count):
+        '''post a recipe with new ingredients and return query count'''
+        payload = {
+            'title': f'recipe with {ingredient_count}',
+            'time_minutes': 10,
+            'price': Decimal('2.50'),
+            'tags': [{'name': f'tag {i}'} for i in range(ingredient_count)],
+            'ingredients': [
+                {'name': f'ing {ingredient_count} {i}'}
+                for i in range(ingredient_count)
+            ],
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(RECIPE_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return len(ctx)
+
+    def test_create_query_count_is_constant(self):
+        '''test saving more tags and ingredients costs no extra queries'''
+        self.assertEqual(
+            self._count_create_queries(1), self._count_create_queries(30)
+        )
+
+    def test_update_query_count_is_constant(self):
+        '''test replacing many tags costs no extra queries'''
+        counts = []
+        for count in [1, 30]:
+            recipe = create_recipe(user=self.user)
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'old {count}')
+            )
+            payload = {
+                'tags': [{'name': f'new {count} {i}'} for i in range(count)]
+            }
+            with CaptureQueriesContext(connection) as ctx:
+                res = self.client.patch(
+                    detail_url(recipe.id), payload, format='json'
+                )
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(recipe.tags.count(), count)
+            counts.append(len(ctx))
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_update_keeps_unchanged_tag_links(self):
+        '''test updating tags only touches the links that changed'''
+        recipe = create_recipe(user=self.user)
+        keep = Tag.objects.create(user=self.user, name='keep')
+        drop = Tag.objects.create(user=self.user, name='drop')
+        recipe.tags.add(keep, drop)
+        through = Recipe.tags.through
+        kept_link = through.objects.get(recipe=recipe, tag=keep)
+
+        payload = {'tags': [{'name': 'keep'}, {'name': 'new'}]}
+        res = self.client.patch(detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(through.objects.filter(id=kept_link.id).exists())
+        self.assertEqual(
+            sorted(recipe.tags.values_list('name', flat=True)),
+            ['keep', 'new'],
+        )
+
+    def test_duplicate_tag_names_in_payload(self):
+        '''test repeating a tag name creates and links it once'''
+        payload = {
+            'title': 'Soup',
+            'time_minutes': 10,
+            'price': Decimal('2.50'),
+            'tags': [{'name': 'Hot'}, {'name': 'Hot'}],
+        }
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(recipe.tags.count(), 1)
+
+
+class CoverageTests(TestCase):
+    '''test ranking recipes by the ingredients the user has'''
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpassword123')
+        self.client.force_authenticate(self.user)
+        self.salt, self.pepper, self.egg, self.flour = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ['Salt', 'Pepper', 'Egg', 'Flour']
+        ]
+        self.full = self._recipe('full', self.salt, self.pepper)
+        self.half = self._recipe(
+            'half', self.salt, self.pepper, self.egg, self.flour
+        )
+        self.third = self._recipe('third', self.salt, self.egg, self.flour)
+        self._recipe('none', self.egg)
+        self._recipe('empty')
+        self.have = f'{self.salt.id},{self.pepper.id}'
+
+    def _recipe(self, title, *ingredients):
+        recipe = create_recipe(user=self.user, title=title)
+        recipe.ingredients.add(*ingredients)
+        return recipe
+
+    def test_rank_by_coverage(self):
+        '''test recipes are ordered by the share of ingredients covered'''
+        res = self.client.get(RECIPE_URL, {'have': self.have})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['title'] for recipe in res.data],
+            ['full', 'half', 'third'],
+        )
+
+    def test_min_coverage(self):
+        '''test recipes below min_coverage are left out'''
+        res = self.client.get(
+            RECIPE_URL, {'have': self.have, 'min_coverage': '0.5'}
+        )
+
+        self.assertEqual(
+            [recipe['title'] for recipe in res.data], ['full', 'half']
+        )
+
+    def test_invalid_ids(self):
+        '''test ids that are not integers are rejected'''
+        for param in ['have', 'tags', 'ingredients']:
+            for value in ['abc', '1,,2']:
+                res = self.client.get(RECIPE_URL, {param: value})
+
+                self.assertEqual(
+                    res.status_code, status.HTTP_400_BAD_REQUEST
+                )
+                self.assertIn(param, res.data)
+
+    def test_invalid_min_coverage(self):
+        '''test min_coverage must be a number between 0 and 1'''
+        for value in ['x', '1.5', '-1', 'nan']:
+            res = self.client.get(
+                RECIPE_URL, {'have': self.have, 'min_coverage': value}
+            )
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_coverage_pages(self):
+        '''test cursor pages follow coverage order'''
+        # ties on coverage are broken newest first
+        self._recipe('tied', self.salt, self.flour, self.egg)
+        titles = []
+        res = self.client.get(RECIPE_URL, {'have': self.have, 'page_size': 1})
+        while True:
+            titles += [recipe['title'] for recipe in res.data['results']]
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(titles, ['full', 'half', 'tied', 'third'])
+
+    def test_coverage_computed_in_one_query(self):
+        '''test coverage is aggregated in SQL, not per recipe'''
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(RECIPE_URL, {'have': self.have})
+
+        # ETag stats of the user, recipes, tags, ingredients
+        self.assertEqual(len(ctx.captured_queries), 4)
+        recipe_sql = next(
+            q['sql'] for q in ctx.captured_queries if 'ORDER BY' in q['sql']
+        )
+        self.assertIn('GROUP BY', recipe_sql)
+        self.assertIn('core_recipe_ingredients', recipe_sql)
+
+
+class RangeOrderingTests(TestCase):
+    '''test time and price bounds and the ordering parameter'''
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpassword123')
+        self.client.force_authenticate(self.user)
+        for title, minutes, price in [
+            ('quick', 10, '8.00'),
+            ('cheap', 45, '2.50'),
+            ('slow', 120, '8.00'),
+            ('fancy', 30, '30.00'),
+        ]:
+            create_recipe(user=self.user, title=title,
+                          time_minutes=minutes, price=Decimal(price))
+
+    def titles(self, params):
+        res = self.client.get(RECIPE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in res.data]
+
+    def test_range_filters(self):
+        '''test max_time, min_price and max_price bound the results'''
+        self.assertCountEqual(
+            self.titles({'max_time': 45}), ['quick', 'cheap', 'fancy']
+        )
+        self.assertCountEqual(
+            self.titles({'min_price': '8', 'max_price': '10'}),
+            ['quick', 'slow'],
+        )
+        self.assertEqual(
+            self.titles({'max_time': 30, 'max_price': '10'}), ['quick']
+        )
+
+    def test_invalid_range_values(self):
+        '''test bounds must be non negative finite numbers'''
+        for params in [{'max_time': '1.5'}, {'max_time': '-1'},
+                       {'min_price': 'x'}, {'max_price': 'nan'},
+                       {'max_price': 'inf'}]:
+            res = self.client.get(RECIPE_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ordering(self):
+        '''test the whitelisted sort keys, ties newest last'''
+        self.assertEqual(
+            self.titles({'ordering': 'time'}),
+            ['quick', 'fancy', 'cheap', 'slow'],
+        )
+        self.assertEqual(
+            self.titles({'ordering': 'price'}),
+            ['cheap', 'quick', 'slow', 'fancy'],
+        )
+        self.assertEqual(
+            self.titles({'ordering': '-price'}),
+            ['fancy', 'slow', 'quick', 'cheap'],
+        )
+        self.assertEqual(
+            self.titles({'ordering': 'newest'}),
+            ['fancy', 'slow', 'cheap', 'quick'],
+        )
+
+    def test_invalid_ordering(self):
+        '''test sort keys outside the whitelist are rejected'''
+        for ordering in ['title', 'user__email', '-id']:
+            res = self.client.get(RECIPE_URL, {'ordering': ordering})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ordering_pages(self):
+        '''test cursor pages follow the sort key across ties'''
+        titles = []
+        res = self.client.get(
+            RECIPE_URL, {'ordering': 'price', 'page_size': 1}
+        )
+        while True:
+            titles += [recipe['title'] for recipe in res.data['results']]
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(titles, ['cheap', 'quick', 'slow', 'fancy'])
+
+    def test_sorted_range_plan_is_index_scan(self):
+        '''test a bounded, sorted list is read in index order'''
+        for params, index in [
+            ({'ordering': 'time', 'max_time': 60}, 'recipe_user_time_idx'),
+            ({'ordering': '-price', 'max_price': 50}, 'recipe_user_price_idx'),
+        ]:
+            request = Request(APIRequestFactory().get(RECIPE_URL, params))
+            request.user = self.user
+            view = RecipeViewSet(action='list', request=request)
+
+            with connection.cursor() as cursor:
+                # a handful of rows would otherwise be sorted in memory
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_sort = off')
+                plan = view.get_queryset().explain()
+
+            self.assertIn(index, plan)
+            self.assertNotIn('Sort', plan)
+
+
+class SparseFieldsTests(TestCase):
+    '''test fields= and expand= projections'''
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpassword123')
+        self.client.force_authenticate(self.user)
+        self.recipes = []
+        for i in range(3):
+            recipe = create_recipe(user=self.user, title=f'recipe {i}',
+                                   price=Decimal(f'{i}.50'))
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'tag {i}')
+            )
+            self.recipes.append(recipe)
+
+    def _recipe_sql(self, ctx):
+        return next(
+            q['sql'] for q in ctx.captured_queries
+            if 'FROM "core_recipe"' in q['sql'] and 'COUNT' not in q['sql']
+        )
+
+    def test_list_fields(self):
+        '''test only the named fields are serialized and loaded'''
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPE_URL, {'fields': 'title,id'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0], {
+            'id': self.recipes[-1].id, 'title': 'recipe 2',
+        })
+        # ETag stats of the user and recipes, no tag or ingredient prefetch
+        self.assertEqual(len(ctx.captured_queries), 2)
+        recipe_sql = self._recipe_sql(ctx)
+        self.assertNotIn('"link"', recipe_sql)
+        self.assertNotIn('"price"', recipe_sql)
+
+    def test_list_expand(self):
+        '''test expand embeds a relation in the projection'''
+        with self.assertNumQueries(3):
+            res = self.client.get(
+                RECIPE_URL, {'fields': 'id', 'expand': 'tags'}
+            )
+
+        self.assertEqual(set(res.data[0]), {'id', 'tags'})
+        self.assertEqual(res.data[0]['tags'][0]['name'], 'tag 2')
+
+    def test_detail_fields(self):
+        '''test detail responses can be trimmed too'''
+        recipe = self.recipes[0]
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(
+                detail_url(recipe.id), {'fields': 'title,description'}
+            )
+
+        self.assertEqual(res.data, {
+            'title': recipe.title, 'description': recipe.description,
+        })
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertNotIn('"link"', self._recipe_sql(ctx))
+
+    def test_projection_keeps_sort_key_loaded(self):
+        '''test paging by a sort key not in fields adds no queries'''
+        with self.assertNumQueries(2):
+            res = self.client.get(RECIPE_URL, {
+                'fields': 'title', 'ordering': 'price', 'page_size': 2,
+            })
+
+        self.assertEqual(
+            res.data['results'], [{'title': 'recipe 0'}, {'title': 'recipe 1'}]
+        )
+
+    def test_unknown_fields_rejected(self):
+        '''test fields and expand are validated'''
+        for params in [{'fields': 'id,secret'},
+                       {'fields': 'id', 'expand': 'user'}]:
+            res = self.client.get(RECIPE_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(
+            RECIPE_URL, {'fields': 'description'}
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_detail_etag_varies_with_fields(self):
+        '''test a trimmed copy does not validate the full one'''
+        url = detail_url(self.recipes[0].id)
+        sparse = self.client.get(url, {'fields': 'id'})
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=sparse['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        res = self.client.get(
+            url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=sparse['ETag']
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class RecipeRowsSerializerTests(TestCase):
+    '''test lists serialized from rows match RecipeSerializer'''
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpassword123')
+        self.client.force_authenticate(self.user)
+        tags = [Tag.objects.create(user=self.user, name=name)
+                for name in ['Vegan', 'Dinner', 'Quick']]
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        plain = create_recipe(user=self.user, title='Plain', link='',
+                              price=Decimal('7'))
+        plain.ingredients.add(salt)
+        tagged = create_recipe(user=self.user, title='Cr\u00e8me \u2028',
+                               image='uploads/recipe/creme.jpg')
+        tagged.tags.add(tags[2], tags[0], tags[1])
+        tagged.ingredients.add(salt)
+        create_recipe(user=self.user, title='Bare', time_minutes=5)
+
+    def expected(self, res, fields=None, ordering=('-id',)):
+        '''RecipeSerializer output for the user's recipes'''
+        recipes = Recipe.objects.filter(user=self.user).order_by(
+            *ordering
+        ).prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch(
+                'ingredients', queryset=Ingredient.objects.order_by('id')
+            ),
+        )
+        return RecipeSerializer(
+            recipes, many=True, fields=fields,
+            context={'request': res.wsgi_request},
+        ).data
+
+    def test_list_matches_recipe_serializer(self):
+        '''test list responses are byte for byte the serializer output'''
+        for params, fields, ordering in [
+            ({}, None, ('-id',)),
+            ({'ordering': 'price'}, None, ('price', 'id')),
+            ({'fields': 'images,title', 'expand': 'tags'},
+             ['title', 'tags', 'images'], ('-id',)),
+        ]:
+            res = self.client.get(RECIPE_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                res.content,
+                JSONRenderer().render(self.expected(res, fields, ordering)),
+            )
+
+    def test_paginated_list_matches_recipe_serializer(self):
+        '''test pages of rows match the serializer output'''
+        results = []
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+        while True:
+            results += res.json()['results']
+            if not res.json()['next']:
+                break
+            res = self.client.get(res.json()['next'])
+
+        self.assertEqual(
+            results, json.loads(JSONRenderer().render(self.expected(res)))
+        )
+
+
+class RecipePaginationTests(TestCase):
+    '''test opt-in cursor pagination of recipes'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpassword123')
+        self.client.force_authenticate(self.user)
+
+    def test_list_unpaginated_by_default(self):
+        '''test plain list requests return every recipe'''
+        for i in range(3):
+            create_recipe(user=self.user, title=f'recipe {i}')
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 3)
+
+    def test_paginate_with_page_size(self):
+        '''test walking pages returns every recipe newest first'''
+        recipes = [
+            create_recipe(user=self.user, title=f'recipe {i}')
+            for i in range(5)
+        ]
+
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['id'] for r in res.data['results']],
+            [recipes[4].id, recipes[3].id],
+        )
+        seen = [r['id'] for r in res.data['results']]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            seen += [r['id'] for r in res.data['results']]
+
+        self.assertEqual(seen, [r.id for r in reversed(recipes)])
+
+    def test_cursor_stable_across_inserts(self):
+        '''test recipes created between pages do not shift the cursor'''
+        recipes = [
+            create_recipe(user=self.user, title=f'recipe {i}')
+            for i in range(4)
+        ]
+
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+        create_recipe(user=self.user, title='newer recipe')
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(
+            [r['id'] for r in res.data['results']],
+            [recipes[1].id, recipes[0].id],
+        )
+
+    def test_page_size_is_capped(self):
+        '''test page size cannot exceed the maximum'''
+        for i in range(3):
+            create_recipe(user=self.user, title=f'recipe {i}')
+
+        with patch.object(RecipeCursorPagination, 'max_page_size', 2):
+            res = self.client.get(RECIPE_URL, {'page_size': 100})
+
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
+
+
+class BulkImportTests(TestCase):
+    '''test importing recipes from JSON Lines'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpassword123')
+        self.client.force_authenticate(self.user)
+
+    def _post_lines(self, rows):
+        body = '\n'.join(
+            row if isinstance(row, str) else json.dumps(row) for row in rows
+        )
+        return self.client.post(
+            BULK_URL, body, content_type='application/x-ndjson'
+        )
+
+    def test_bulk_import(self):
+        '''test importing recipes with tags and ingredients'''
+        Tag.objects.create(user=self.user, name='Dinner')
+        rows = [
+            {
+                'title': f'recipe {i}',
+                'time_minutes': 10,
+                'price': '4.50',
+                'description': 'imported',
+                'tags': [{'name': 'Dinner'}, {'name': f'tag {i}'}],
+                'ingredients': [{'name': 'Salt'}],
+            }
+            for i in range(3)
+        ]
+
+        res = self._post_lines(rows)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'created': 3, 'errors': []})
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 3)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 4)
+        self.assertEqual(
+            Ingredient.objects.filter(user=self.user).count(), 1
+        )
+        for recipe in recipes:
+            self.assertEqual(recipe.description, 'imported')
+            self.assertEqual(recipe.tags.count(), 2)
+            self.assertEqual(recipe.ingredients.count(), 1)
+
+    def test_bulk_import_reports_bad_rows(self):
+        '''test invalid rows are reported and valid rows still saved'''
+        rows = [
+            {'title': 'good', 'time_minutes': 5, 'price': '1.00'},
+            '{not json',
+            {'title': 'no price', 'time_minutes': 5},
+            '',
+            {'title': 'also good', 'time_minutes': 5, 'price': '2.00'},
+        ]
+
+        res = self._post_lines(rows)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(
+            [error['line'] for error in res.data['errors']], [2, 3]
+        )
+        self.assertIn('price', res.data['errors'][1]['errors'])
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_import_query_count_is_constant(self):
+        '''test a chunk costs the same queries for any number of rows'''
+        counts = []
+        for count in [1, 20]:
+            rows = [
+                {
+                    'title': f'recipe {i}',
+                    'time_minutes': 10,
+                    'price': '4.50',
+                    'tags': [{'name': f'tag {count} {i}'}],
+                    'ingredients': [{'name': f'ing {count} {i}'}],
+                }
+                for i in range(count)
+            ]
+            with CaptureQueriesContext(connection) as ctx:
+                res = self._post_lines(rows)
+            self.assertEqual(res.data['created'], count)
+            counts.append(len(ctx))
 
+        self.assertEqual(counts[0], counts[1])
+
+    def test_bulk_import_empty_body(self):
+        '''test an empty body imports nothing'''
+        res = self._post_lines([])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'created': 0, 'errors': []})
+
+
+class ExportTests(TestCase):
+    '''test streaming recipe exports'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpassword123')
+        self.client.force_authenticate(self.user)
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        self.recipes = []
+        for i in range(5):
+            recipe = create_recipe(user=self.user, title=f'recipe {i}')
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f'tag {i}')
+            )
+            recipe.ingredients.add(salt)
+            self.recipes.append(recipe)
+        create_recipe(
+            user=create_user(email='other@example.com', password='pass123')
+        )
+
+    def _content(self, res):
+        return b''.join(res.streaming_content).decode()
+
+    def test_export_ndjson(self):
+        '''test export streams every recipe of the user as JSON Lines'''
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = self._content(res).splitlines()
+        expected = RecipeSerializer(
+            Recipe.objects.filter(user=self.user).order_by('-id'), many=True
+        ).data
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            json.loads(json.dumps(expected)),
+        )
+
+    def test_export_csv(self):
+        '''test exporting recipes as CSV'''
+        res = self.client.get(EXPORT_URL, {'export_format': 'csv'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        rows = list(csv.DictReader(io.StringIO(self._content(res))))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['id'], str(self.recipes[-1].id))
+        self.assertEqual(rows[0]['tags'], 'tag 4')
+        self.assertEqual(rows[0]['price'], '5.23')
+
+    def test_export_invalid_format(self):
+        '''test an unknown export format is rejected'''
+        res = self.client.get(EXPORT_URL, {'export_format': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_queries_per_chunk(self):
+        '''test export prefetches per chunk rather than per recipe'''
+        with patch('recipe.exporters.EXPORT_CHUNK_SIZE', 2):
+            res = self.client.get(EXPORT_URL)
+            with CaptureQueriesContext(connection) as ctx:
+                lines = self._content(res).splitlines()
+
+        self.assertEqual(len(lines), 5)
+        prefetches = [
+            q for q in ctx.captured_queries if 'core_recipe_tags' in q['sql']
+        ]
+        self.assertEqual(len(prefetches), 3)
+
+
+class ConditionalRequestTests(TestCase):
+    '''test ETag and Last-Modified handling of recipe endpoints'''
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpassword123')
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+
+    def test_list_not_modified(self):
+        '''test a list matching the client ETag returns 304'''
+        res = self.client.get(RECIPE_URL)
+        etag = res['ETag']
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+        self.assertEqual(res['ETag'], etag)
+
+    def test_list_etag_changes_with_data(self):
+        '''test adding or removing recipes changes the list ETag'''
+        etag = self.client.get(RECIPE_URL)['ETag']
+        other = create_recipe(user=self.user, title='other')
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 2)
+
+        etag = res['ETag']
+        other.delete()
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+
+    def test_list_etag_depends_on_params(self):
+        '''test differently filtered lists have different ETags'''
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(RECIPE_URL)
+        filtered = self.client.get(RECIPE_URL, {'tags': str(tag.id)})
+
+        self.assertNotEqual(res['ETag'], filtered['ETag'])
+
+    def test_list_etag_stats_shared_by_filters(self):
+        '''test the ETag aggregates the user's recipes once per change'''
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(RECIPE_URL, {'search': 'sample'})
+            self.client.get(RECIPE_URL, {'search': 'other', 'have': '1'})
+            self.client.get(RECIPE_URL, {'page_size': 1})
+
+        aggregates = [
+            query['sql'] for query in queries if 'MAX(' in query['sql']
+        ]
+        self.assertEqual(len(aggregates), 1)
+        self.assertNotIn('search_vector', aggregates[0])
+
+    def test_detail_validators(self):
+        '''test detail responses carry ETag and Last-Modified'''
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+        self.assertIn('private', res['Cache-Control'])
+
+    def test_detail_not_modified_skips_serialization(self):
+        '''test an unchanged recipe returns 304 with a single query'''
+        etag = self.client.get(detail_url(self.recipe.id))['ETag']
+
+        with self.assertNumQueries(1):
+            res = self.client.get(
+                detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=etag
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_if_modified_since(self):
+        '''test If-Modified-Since after the last update returns 304'''
+        last_modified = self.client.get(
+            detail_url(self.recipe.id)
+        )['Last-Modified']
+
+        res = self.client.get(
+            detail_url(self.recipe.id), HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_modified_by_tag_changes(self):
+        '''test linking or renaming a tag invalidates the detail ETag'''
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        self.recipe.tags.add(tag)
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        etag = res['ETag']
+        tag.name = 'Plant based'
+        tag.save()
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Plant based')
+
+    def test_detail_of_other_user_not_found(self):
+        '''test conditional requests do not leak other users' recipes'''
+        other = create_user(email='other@example.com', password='pass1234')
+        recipe = create_recipe(user=other)
+
+        res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(RECIPE_IMAGE_WORKERS=0)
 class ImageUploadTests(TestCase):
 
     def setUp(self):
@@ -475,24 +1442,102 @@ class ImageUploadTests(TestCase):
         self.recipe = create_recipe(user=self.user)
 
     def tearDown(self):
-        self.recipe.image.delete()
+        self.recipe.refresh_from_db()
+        if self.recipe.image:
+            default_storage.delete(thumbnail_name(self.recipe.image.name))
+            self.recipe.image.delete()
+
+    def upload(self, image_file):
+        '''post a file to the upload endpoint and run the queued job'''
+        url = image_upload_url(self.recipe.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                url, {'image': image_file}, format='multipart'
+            )
+        self.recipe.refresh_from_db()
+        return res
 
     def test_upload_image(self):
         '''test uploading images'''
-        url = image_upload_url(self.recipe.id)
         with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
             img = Image.new('RGB', (10, 10))
             img.save(image_file, format='JPEG')
             image_file.seek(0)
-            payload = {
-                'image': image_file,
-            }
-            res = self.client.post(url, payload, fromat='multipart')
+            res = self.upload(image_file)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_PENDING)
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertTrue(os.path.exists(self.recipe.image.path))
+        self.assertTrue(
+            default_storage.exists(thumbnail_name(self.recipe.image.name))
+        )
 
+    def test_upload_is_processed_after_commit(self):
+        '''test the image is only processed once the request committed'''
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            with self.captureOnCommitCallbacks() as callbacks:
+                res = self.client.post(
+                    url, {'image': image_file}, format='multipart'
+                )
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(len(callbacks), 1)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_PENDING)
+        self.assertFalse(self.recipe.image)
+        # stored so a restart before processing does not lose it
+        self.assertTrue(self.recipe.image_jobs.exists())
+        callbacks[0]()
         self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertFalse(self.recipe.image_jobs.exists())
+
+    def test_upload_strips_exif_and_thumbnails(self):
+        '''test metadata is dropped and the thumbnail is bounded'''
+        exif = Image.Exif()
+        exif[0x010F] = 'camera maker'
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (1000, 600)).save(
+                image_file, format='JPEG', exif=exif.tobytes()
+            )
+            image_file.seek(0)
+            self.upload(image_file)
+
+        with Image.open(self.recipe.image.path) as img:
+            self.assertEqual(img.size, (1000, 600))
+            self.assertNotIn('exif', img.info)
+        thumb = default_storage.path(thumbnail_name(self.recipe.image.name))
+        with Image.open(thumb) as img:
+            self.assertLessEqual(max(img.size), max(THUMBNAIL_SIZE))
+
+    def test_upload_invalid_image_fails(self):
+        '''test a file that is not an image is marked failed'''
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            image_file.write(b'not an image')
+            image_file.seek(0)
+            res = self.upload(image_file)
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+        self.assertFalse(self.recipe.image)
+
+    def test_image_status_changes_detail_etag(self):
+        '''test clients polling the detail see the job fail'''
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+        staged = default_storage.save(
+            'uploads/staging/invalid.jpg', ContentFile(b'not an image')
+        )
+
+        process_image(self.recipe.id, staged)
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertIn('image', res.data)
-        self.assertTrue(os.path.exists(self.recipe.image.path))
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_FAILED)
 
     def test_upload_bad_request(self):
         '''test uploading invalid image'''
@@ -504,3 +1549,279 @@ class ImageUploadTests(TestCase):
         res = self.client.post(url, payload, format='multipart')
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RenditionTests(TestCase):
+    '''test resized images generated on demand'''
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpassword123')
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+        self._set_image(Image.new('RGB', (1000, 600), 'red'), 'JPEG')
+
+    def tearDown(self):
+        for size in RENDITION_SIZES:
+            for fmt in RENDITION_FORMATS:
+                default_storage.delete(
+                    rendition_name(self.recipe.image.name, size, fmt)
+                )
+        self.recipe.image.delete()
+
+    def _set_image(self, img, fmt):
+        content = io.BytesIO()
+        img.save(content, format=fmt)
+        if self.recipe.image:
+            self.recipe.image.delete(save=False)
+        self.recipe.image.save(
+            f'image.{fmt.lower()}', ContentFile(content.getvalue())
+        )
+
+    def test_list_includes_rendition_urls(self):
+        '''test list exposes rendition urls without extra queries'''
+        create_recipe(user=self.user, title='no image')
+
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPE_URL)
+
+        with_image, without_image = res.data[1], res.data[0]
+        self.assertEqual(without_image['images'], {})
+        self.assertEqual(
+            sorted(with_image['images']),
+            sorted(str(size) for size in RENDITION_SIZES),
+        )
+        self.assertTrue(with_image['images']['128']['jpeg'].endswith(
+            rendition_url(self.recipe.id, 128, 'jpeg')
+        ))
+
+    def test_rendition_is_generated_once(self):
+        '''test the first request renders, later ones reuse the file'''
+        url = rendition_url(self.recipe.id, 128, 'jpeg')
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_302_FOUND)
+        name = rendition_name(self.recipe.image.name, 128, 'jpeg')
+        self.assertEqual(res['Location'], default_storage.url(name))
+        with default_storage.open(name) as f, Image.open(f) as img:
+            self.assertEqual(img.format, 'JPEG')
+            self.assertEqual(img.size, (128, 77))
+
+        with patch('recipe.renditions._render') as render:
+            res = self.client.get(url)
+            cache.clear()
+            self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_302_FOUND)
+        render.assert_not_called()
+
+    def test_transparent_image_rendered_as_jpeg(self):
+        '''test images with alpha are flattened for JPEG renditions'''
+        self._set_image(Image.new('RGBA', (300, 300), (0, 0, 0, 0)), 'PNG')
+
+        res = self.client.get(rendition_url(self.recipe.id, 128, 'jpeg'))
+
+        self.assertEqual(res.status_code, status.HTTP_302_FOUND)
+        name = rendition_name(self.recipe.image.name, 128, 'jpeg')
+        with default_storage.open(name) as f, Image.open(f) as img:
+            self.assertEqual(img.getpixel((0, 0)), (255, 255, 255))
+
+    @skipUnless('webp' in RENDITION_FORMATS, 'Pillow lacks WebP support')
+    def test_webp_rendition(self):
+        '''test WebP renditions are served when Pillow supports them'''
+        res = self.client.get(rendition_url(self.recipe.id, 512, 'webp'))
+
+        self.assertEqual(res.status_code, status.HTTP_302_FOUND)
+        name = rendition_name(self.recipe.image.name, 512, 'webp')
+        with default_storage.open(name) as f, Image.open(f) as img:
+            self.assertEqual(img.format, 'WEBP')
+
+    def test_unknown_rendition_not_found(self):
+        '''test sizes and formats outside the configured set are 404'''
+        for size, fmt in [(200, 'jpeg'), (128, 'gif')]:
+            res = self.client.get(rendition_url(self.recipe.id, size, fmt))
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rendition_without_image_not_found(self):
+        '''test recipes without an image have no renditions'''
+        recipe = create_recipe(user=self.user, title='no image')
+
+        res = self.client.get(rendition_url(recipe.id, 128, 'jpeg'))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rendition_of_other_user_not_found(self):
+        '''test renditions of other users' recipes are not served'''
+        other = create_user(email='other@example.com', password='pass12345')
+        self.client.force_authenticate(other)
+
+        res = self.client.get(rendition_url(self.recipe.id, 128, 'jpeg'))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+def uploads_url(recipe_id):
+    '''create and return the url starting a resumable upload'''
+    return reverse('recipe:recipe-uploads', args=[recipe_id])
+
+
+def upload_url(recipe_id, upload_id, finalize=False):
+    '''create and return the url of a resumable upload'''
+    if finalize:
+        return reverse(
+            'recipe:recipe-upload-finalize', args=[recipe_id, upload_id]
+        )
+    return reverse('recipe:recipe-upload', args=[recipe_id, upload_id])
+
+
+@override_settings(RECIPE_IMAGE_WORKERS=0)
+class ResumableUploadTests(TestCase):
+    '''test uploading recipe images in byte ranges'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com',
+                                password='testpassword123')
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+        content = io.BytesIO()
+        Image.new('RGB', (50, 50), 'blue').save(content, format='JPEG')
+        self.content = content.getvalue()
+
+    def tearDown(self):
+        for upload in ImageUpload.objects.all():
+            discard_upload(upload)
+        self.recipe.refresh_from_db()
+        if self.recipe.image:
+            default_storage.delete(thumbnail_name(self.recipe.image.name))
+            self.recipe.image.delete()
+
+    def _start(self, size=None):
+        res = self.client.post(uploads_url(self.recipe.id), {
+            'filename': 'photo.jpg',
+            'size': len(self.content) if size is None else size,
+        })
+        return res
+
+    def _put(self, upload_id, start, end, body=None):
+        '''send bytes start-end (exclusive) of the content'''
+        return self.client.put(
+            upload_url(self.recipe.id, upload_id),
+            self.content[start:end] if body is None else body,
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end - 1}/{len(self.content)}',
+        )
+
+    def test_start_upload(self):
+        '''test starting an upload returns its id and progress'''
+        res = self._start()
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['received'], 0)
+        upload = ImageUpload.objects.get(id=res.data['id'])
+        self.assertEqual(upload.recipe, self.recipe)
+
+    def test_start_upload_too_large(self):
+        '''test uploads above the configured limit are rejected'''
+        with self.settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=10):
+            res = self._start(size=11)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ImageUpload.objects.exists())
+
+    def test_upload_in_chunks_and_finalize(self):
+        '''test chunks are assembled and processed as an image upload'''
+        upload_id = self._start().data['id']
+        half = len(self.content) // 2
+
+        res = self._put(upload_id, 0, half)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['received'], half)
+        res = self._put(upload_id, half, len(self.content))
+        self.assertEqual(res.data['received'], len(self.content))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                upload_url(self.recipe.id, upload_id, finalize=True)
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        with Image.open(self.recipe.image.path) as img:
+            self.assertEqual(img.size, (50, 50))
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertFalse(ImageUploadChunk.objects.exists())
+
+    def test_resume_reports_progress(self):
+        '''test clients can ask how many bytes were stored'''
+        upload_id = self._start().data['id']
+        self._put(upload_id, 0, 10)
+
+        res = self.client.get(upload_url(self.recipe.id, upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['received'], 10)
+
+    def test_out_of_order_chunk_conflicts(self):
+        '''test ranges not continuing the upload are rejected'''
+        upload_id = self._start().data['id']
+        self._put(upload_id, 0, 10)
+
+        for start in [0, 20]:
+            res = self._put(upload_id, start, start + 10)
+            self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+            self.assertEqual(res.data['received'], 10)
+
+        self.assertEqual(ImageUploadChunk.objects.count(), 1)
+
+    def test_body_not_matching_range_rejected(self):
+        '''test bodies shorter or longer than the range are discarded'''
+        upload_id = self._start().data['id']
+
+        for body in [self.content[:5], self.content[:15]]:
+            res = self._put(upload_id, 0, 10, body=body)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        upload = ImageUpload.objects.get(id=upload_id)
+        self.assertEqual(upload.received, 0)
+        self.assertFalse(upload.chunks.exists())
+
+    def test_invalid_content_range_rejected(self):
+        '''test missing or out of bounds ranges are rejected'''
+        upload_id = self._start().data['id']
+        url = upload_url(self.recipe.id, upload_id)
+        size = len(self.content)
+
+        for header in [None, 'bytes 0-9', f'bytes 0-{size}/{size}']:
+            extra = {'HTTP_CONTENT_RANGE': header} if header else {}
+            res = self.client.put(
+                url, b'x' * 10, content_type='application/octet-stream',
+                **extra
+            )
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_finalize_incomplete_upload(self):
+        '''test uploads missing bytes cannot be finalized'''
+        upload_id = self._start().data['id']
+        self._put(upload_id, 0, 10)
+
+        res = self.client.post(
+            upload_url(self.recipe.id, upload_id, finalize=True)
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(ImageUpload.objects.filter(id=upload_id).exists())
+
+    def test_upload_of_other_user_not_found(self):
+        '''test uploads are only reachable through the owner's recipe'''
+        upload_id = self._start().data['id']
+        other = create_user(email='other@example.com', password='pass12345')
+        self.client.force_authenticate(other)
+
+        res = self.client.get(upload_url(self.recipe.id, upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
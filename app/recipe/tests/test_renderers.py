@@ -0,0 +1,46 @@
+'''tests for the recipe api renderers'''
+import datetime
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from recipe import renderers
+from recipe.renderers import ORJSONRenderer
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    '''test ORJSONRenderer output matches JSONRenderer'''
+
+    data = {
+        'title': 'Cr\u00e8me br\u00fbl\u00e9e \u2028\u2029',
+        'price': Decimal('5.25'),
+        'created_at': datetime.datetime(
+            2021, 5, 4, 3, 2, 1, 123456, tzinfo=timezone.utc
+        ),
+        'day': datetime.date(2021, 5, 4),
+        'detail': gettext_lazy('Not found.'),
+        'tags': [{'id': 1, 'name': 'Vegan'}],
+        1: None,
+    }
+
+    @skipUnless(renderers.orjson, 'orjson is not installed')
+    def test_render_matches_json_renderer(self):
+        '''test the bytes are those JSONRenderer would produce'''
+        self.assertEqual(
+            ORJSONRenderer().render(self.data),
+            JSONRenderer().render(self.data),
+        )
+
+    def test_indented_and_empty_render(self):
+        '''test indented and empty responses are left to JSONRenderer'''
+        media_type = 'application/json; indent=2'
+
+        self.assertEqual(
+            ORJSONRenderer().render(self.data, media_type),
+            JSONRenderer().render(self.data, media_type),
+        )
+        self.assertEqual(ORJSONRenderer().render(None), b'')
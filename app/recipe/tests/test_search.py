@@ -0,0 +1,216 @@
+'''tests for full text recipe search'''
+import json
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.importers import RecipeImporter
+from recipe.search import search_recipes
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def create_recipe(user, **params):
+    '''create and return sample recipe'''
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.25'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeSearchTests(TestCase):
+    '''test the search parameter of the recipe list'''
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, text):
+        '''return the titles found for text'''
+        res = self.client.get(RECIPE_URL, {'search': text})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in res.data]
+
+    def test_search_title_and_description(self):
+        '''test words are matched in title and description, stemmed'''
+        create_recipe(self.user, title='Thai Green Curry')
+        create_recipe(self.user, title='Pasta', description='Creamy sauces')
+        create_recipe(self.user, title='Salad')
+
+        self.assertEqual(self.search('curries'), ['Thai Green Curry'])
+        self.assertEqual(self.search('sauce'), ['Pasta'])
+        self.assertEqual(self.search('curry -thai'), [])
+
+    def test_search_tag_and_ingredient_names(self):
+        '''test names of linked tags and ingredients are searchable'''
+        tagged = create_recipe(self.user, title='Stew')
+        tagged.tags.add(Tag.objects.create(user=self.user, name='Winter'))
+        cooked = create_recipe(self.user, title='Soup')
+        cooked.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Pumpkin')
+        )
+
+        self.assertEqual(self.search('winter'), ['Stew'])
+        self.assertEqual(self.search('pumpkin'), ['Soup'])
+
+    def test_search_ranks_title_matches_first(self):
+        '''test title matches outrank description matches'''
+        create_recipe(self.user, title='Bread', description='Uses garlic')
+        create_recipe(self.user, title='Garlic Bread')
+        create_recipe(self.user, title='Toast', description='Garlic')
+
+        titles = self.search('garlic')
+
+        self.assertEqual(titles[0], 'Garlic Bread')
+        self.assertCountEqual(titles[1:], ['Bread', 'Toast'])
+
+    def test_search_only_own_recipes(self):
+        '''test other users' recipes are not searched'''
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'testpass123'
+        )
+        create_recipe(other, title='Lasagne')
+
+        self.assertEqual(self.search('lasagne'), [])
+
+    def test_search_follows_renames_and_unlinks(self):
+        '''test search vectors follow tag renames, unlinks and deletes'''
+        recipe = create_recipe(self.user, title='Stew')
+        tag = Tag.objects.create(user=self.user, name='Winter')
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        recipe.tags.add(tag)
+        recipe.ingredients.add(salt)
+
+        tag.name = 'Autumn'
+        tag.save()
+        self.assertEqual(self.search('autumn'), ['Stew'])
+        self.assertEqual(self.search('winter'), [])
+
+        tag.recipe_set.clear()
+        self.assertEqual(self.search('autumn'), [])
+
+        salt.delete()
+        self.assertEqual(self.search('salt'), [])
+
+        recipe.title = 'Goulash'
+        recipe.save()
+        self.assertEqual(self.search('goulash'), ['Goulash'])
+
+    def test_search_covers_bulk_imports(self):
+        '''test recipes created by the bulk importer are searchable'''
+        line = json.dumps({
+            'title': 'Imported', 'time_minutes': 5, 'price': '1.00',
+            'ingredients': [{'name': 'Saffron'}],
+        })
+
+        RecipeImporter(self.user).run([line.encode()])
+
+        self.assertEqual(self.search('saffron'), ['Imported'])
+
+    def test_search_pages_by_rank(self):
+        '''test cursor pages of ranked results neither skip nor repeat'''
+        for i in range(3):
+            create_recipe(self.user, title='Rice', description=f'rice {i}')
+        for i in range(3):
+            create_recipe(self.user, title=f'Bowl {i}', description='rice')
+        expected = self.search('rice')
+
+        titles = []
+        res = self.client.get(RECIPE_URL, {'search': 'rice', 'page_size': 2})
+        while True:
+            titles += [recipe['title'] for recipe in res.data['results']]
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(titles, expected)
+        self.assertEqual(len(titles), 6)
+
+    def test_search_uses_gin_index(self):
+        '''test the search filter can be answered from the GIN index'''
+        queryset = search_recipes(Recipe.objects.all(), 'curry')
+
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+
+        self.assertIn('recipe_search_vector_idx', plan)
+
+    @patch('recipe.search.search_supported', return_value=False)
+    def test_search_fallback_matches_substrings(self, supported):
+        '''test databases without full text search match substrings'''
+        recipe = create_recipe(self.user, title='Stew')
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Winter'))
+        create_recipe(self.user, title='Pasta', description='With cheese')
+
+        self.assertEqual(self.search('inte'), ['Stew'])
+        self.assertEqual(self.search('chee'), ['Pasta'])
+
+
+class SearchFallbackTests(SimpleTestCase):
+    '''test the substring search on a database without full text search'''
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # registered after the checks blocking unlisted databases
+        connections.databases['search_fallback'] = {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:',
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['search_fallback'].close()
+        del connections['search_fallback']
+        del connections.databases['search_fallback']
+        super().tearDownClass()
+
+    def setUp(self):
+        # bulk inserts skip the signals indexing on the default database,
+        # explicit ids as SQLite does not return them
+        with connections['search_fallback'].schema_editor() as editor:
+            for model in [get_user_model(), Tag, Ingredient, Recipe]:
+                editor.create_model(model)
+        user = get_user_model().objects.using('search_fallback').create(
+            email='user@example.com'
+        )
+        tag = Tag.objects.using('search_fallback').create(
+            user=user, name='Winter'
+        )
+        stew, _ = Recipe.objects.using('search_fallback').bulk_create([
+            Recipe(id=1, user=user, title='Stew', time_minutes=5,
+                   price=Decimal('2.00')),
+            Recipe(id=2, user=user, title='Pasta', description='With cheese',
+                   time_minutes=5, price=Decimal('3.00')),
+        ])
+        Recipe.tags.through.objects.using('search_fallback').create(
+            recipe_id=stew.id, tag_id=tag.id
+        )
+
+    def search(self, text):
+        queryset = search_recipes(
+            Recipe.objects.using('search_fallback').all(), text
+        )
+        return list(queryset.values_list('title', 'rank'))
+
+    def test_matches_substrings(self):
+        self.assertEqual(self.search('inte'), [('Stew', Decimal(0))])
+        self.assertEqual(self.search('chee'), [('Pasta', Decimal(0))])
+        self.assertEqual(self.search('curry'), [])
@@ -1,18 +1,25 @@
 '''test for tags api'''
+import json
 from decimal import Decimal
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
 from django.urls import reverse
 from django.test import TestCase
 
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
 
-from core.models import Tag, Recipe
+from core.models import Ingredient, Tag, Recipe
 
+from recipe.search import trigram_supported, typeahead
 from recipe.serializers import TagSerializer
+from recipe.views import TYPEAHEAD_LIMIT, TYPEAHEAD_MAX_LIMIT, TagViewset
 
 
 TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
 
 
 def detail_url(tag_id):
@@ -90,6 +97,17 @@ class PrivateTagsApiTest(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_to_existing_name(self):
+        '''test renaming a tag to a name already used returns an error'''
+        Tag.objects.create(user=self.user, name='Dessert')
+        tag = Tag.objects.create(user=self.user, name='after dinner')
+
+        res = self.client.patch(detail_url(tag.id), {'name': 'Dessert'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'after dinner')
+
     def test_delete_tag(self):
         '''test delete tag api'''
         tag = Tag.objects.create(user=self.user, name='choco')
@@ -125,6 +143,20 @@ class PrivateTagsApiTest(TestCase):
         self.assertIn(s1.data, res.data)
         self.assertNotIn(s2.data, res.data)
 
+    def test_assigned_only_plan_has_no_distinct(self):
+        '''test assigned_only uses EXISTS instead of DISTINCT'''
+        request = Request(
+            APIRequestFactory().get(TAGS_URL, {'assigned_only': 1})
+        )
+        request.user = self.user
+        queryset = TagViewset(action='list', request=request).get_queryset()
+
+        self.assertFalse(queryset.query.distinct)
+        self.assertIn('EXISTS', str(queryset.query))
+        plan = queryset.explain()
+        self.assertNotIn('Unique', plan)
+        self.assertNotIn('HashAggregate', plan)
+
     def filtered_tags_unique(self):
         '''test filtered tags reutrns unique list'''
         tag = Tag.objects.create(user=self.user, name="Dinner")
@@ -149,3 +181,113 @@ class PrivateTagsApiTest(TestCase):
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_paginate_tags_by_name(self):
+        '''test tags can be paged through in name order'''
+        for name in ['Apple', 'Banana', 'Cherry']:
+            Tag.objects.create(user=self.user, name=name)
+
+        res = self.client.get(TAGS_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [t['name'] for t in res.data['results']], ['Cherry', 'Banana']
+        )
+        res = self.client.get(res.data['next'])
+        self.assertEqual([t['name'] for t in res.data['results']], ['Apple'])
+        self.assertIsNone(res.data['next'])
+
+
+class TypeaheadTests(TestCase):
+    '''test the q typeahead of tags and ingredients'''
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _create(self, model, names):
+        for name in names:
+            model.objects.create(user=self.user, name=name)
+
+    def test_typeahead_prefix_matches_first(self):
+        '''test names starting with q come before other matches'''
+        for model, url in [(Tag, TAGS_URL), (Ingredient, INGREDIENTS_URL)]:
+            self._create(model, ['Tomato', 'Potato', 'Tomatillo', 'Salt'])
+
+            res = self.client.get(url, {'q': 'tom'})
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            names = [item['name'] for item in res.data]
+            self.assertEqual(names[:2], ['Tomatillo', 'Tomato'])
+            self.assertNotIn('Salt', names)
+
+    def test_typeahead_limit(self):
+        '''test results are limited, capped and never paginated'''
+        self._create(Ingredient, [f'Pepper {i:02}' for i in range(60)])
+
+        res = self.client.get(INGREDIENTS_URL, {'q': 'pep'})
+        self.assertEqual(len(res.data), TYPEAHEAD_LIMIT)
+
+        res = self.client.get(
+            INGREDIENTS_URL, {'q': 'pep', 'limit': 3, 'page_size': 2}
+        )
+        self.assertEqual(
+            [item['name'] for item in res.data],
+            ['Pepper 00', 'Pepper 01', 'Pepper 02'],
+        )
+
+        res = self.client.get(INGREDIENTS_URL, {'q': 'pep', 'limit': 500})
+        self.assertEqual(len(res.data), TYPEAHEAD_MAX_LIMIT)
+
+        res = self.client.get(INGREDIENTS_URL, {'q': 'pep', 'limit': 'x'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_typeahead_only_own_names(self):
+        '''test other users' names are not suggested'''
+        other = create_user(email='other@example.com')
+        Ingredient.objects.create(user=other, name='Basil')
+
+        res = self.client.get(INGREDIENTS_URL, {'q': 'bas'})
+
+        self.assertEqual(res.data, [])
+
+    def test_compact_response(self):
+        '''test compact mode returns [id, name] pairs'''
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+
+        res = self.client.get(TAGS_URL, {'q': 've', 'compact': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(res.content), [[tag.id, 'Vegan']])
+
+    def test_invalid_flags(self):
+        '''test non integer flags are rejected'''
+        for param in ['compact', 'assigned_only']:
+            res = self.client.get(TAGS_URL, {param: 'yes'})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(param, res.data)
+
+    def test_typeahead_fuzzy_match(self):
+        '''test misspelled names are found through trigram similarity'''
+        if not trigram_supported():
+            self.skipTest('pg_trgm is not installed')
+        self._create(Ingredient, ['Mozzarella', 'Parmesan'])
+
+        res = self.client.get(INGREDIENTS_URL, {'q': 'mozarela'})
+
+        self.assertEqual([item['name'] for item in res.data], ['Mozzarella'])
+
+    def test_typeahead_uses_trigram_index(self):
+        '''test the typeahead filter can be answered from the index'''
+        if not trigram_supported():
+            self.skipTest('pg_trgm is not installed')
+        queryset = typeahead(Ingredient.objects.all(), 'moz')
+
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+
+        self.assertIn('ingredient_name_trgm_idx', plan)
@@ -0,0 +1,134 @@
+'''resumable recipe image uploads received as byte ranges'''
+import os
+import re
+import uuid
+
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from core.models import ImageUpload, ImageUploadChunk
+from recipe.images import STAGING_DIR
+
+
+PARTIAL_DIR = os.path.join('uploads', 'partial')
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class RangeConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Range does not continue the upload.'
+    default_code = 'range_conflict'
+
+    def __init__(self, received):
+        super().__init__()
+        # keep the offset numeric so clients can resume from it directly
+        self.detail = {'detail': self.detail, 'received': received}
+
+
+class LimitedReader:
+    '''read at most limit bytes from a stream'''
+
+    def __init__(self, stream, limit):
+        self._stream = stream
+        self._remaining = limit
+
+    def read(self, size=-1):
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._stream.read(size) if size else b''
+        self._remaining -= len(data)
+        return data
+
+
+class ChunkReader:
+    '''read stored chunks one after another as a single file'''
+
+    def __init__(self, names):
+        self._names = iter(names)
+        self._current = None
+
+    def read(self, size=-1):
+        while True:
+            if self._current is None:
+                name = next(self._names, None)
+                if name is None:
+                    return b''
+                self._current = default_storage.open(name, 'rb')
+            data = self._current.read(size)
+            if data:
+                return data
+            self._current.close()
+            self._current = None
+
+
+def parse_content_range(header, size):
+    '''return the half open byte range of a Content-Range header'''
+    match = CONTENT_RANGE_RE.match(header or '')
+    if match is None:
+        raise ValidationError(
+            {'Content-Range': 'Expected "bytes <first>-<last>/<size>".'}
+        )
+    first, last, total = map(int, match.groups())
+    if total != size or first > last or last >= size:
+        raise ValidationError(
+            {'Content-Range': f'Range must lie within the {size} bytes.'}
+        )
+    return first, last + 1
+
+
+def write_chunk(upload, start, end, stream):
+    '''store the bytes start-end of an upload streamed from the body'''
+    if start != upload.received:
+        raise RangeConflict(upload.received)
+    # one more byte than the range is read to detect oversized bodies
+    name = default_storage.save(
+        os.path.join(PARTIAL_DIR, f'{upload.pk}-{start}-{uuid.uuid4()}'),
+        File(LimitedReader(stream, end - start + 1)),
+    )
+    try:
+        if default_storage.size(name) != end - start:
+            raise ValidationError(
+                {'Content-Range': 'Body length does not match the range.'}
+            )
+        with transaction.atomic():
+            # a concurrent request for the same range may have won already
+            advanced = ImageUpload.objects.filter(
+                pk=upload.pk, received=start,
+            ).update(received=end, updated_at=timezone.now())
+            if not advanced:
+                upload.refresh_from_db(fields=['received'])
+                raise RangeConflict(upload.received)
+            ImageUploadChunk.objects.create(
+                upload=upload, offset=start, name=name,
+            )
+    except Exception:
+        default_storage.delete(name)
+        raise
+    upload.received = end
+
+
+def discard_upload(upload):
+    '''delete an upload and its stored chunks'''
+    for name in upload.chunks.values_list('name', flat=True):
+        default_storage.delete(name)
+    upload.delete()
+
+
+def assemble_upload(upload):
+    '''join the chunks of a complete upload into the staging area'''
+    if upload.received != upload.size:
+        raise ValidationError(
+            {'detail': f'Received {upload.received} of {upload.size} bytes.'}
+        )
+    names = upload.chunks.order_by('offset').values_list('name', flat=True)
+    ext = os.path.splitext(upload.filename)[1].lower()
+    staged_name = default_storage.save(
+        os.path.join(STAGING_DIR, f'{uuid.uuid4()}{ext}'),
+        File(ChunkReader(list(names))),
+    )
+    discard_upload(upload)
+    return staged_name
@@ -0,0 +1,20 @@
+'''helpers shared by the recipe apis'''
+from itertools import islice
+
+
+def chunked(iterable, size):
+    '''yield lists of at most size items'''
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def through_columns(descriptor):
+    '''return the recipe and attribute id columns of an m2m through table'''
+    field = descriptor.field
+    return (
+        f'{field.m2m_field_name()}_id',
+        f'{field.m2m_reverse_field_name()}_id',
+    )
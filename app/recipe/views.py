@@ -1,5 +1,21 @@
 '''views for recipe apis'''
+from decimal import Decimal, InvalidOperation
 
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Count,
+    DecimalField,
+    Exists,
+    OuterRef,
+    Prefetch,
+    Q,
+)
+from django.db.models.functions import Cast
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.http import Http404, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
@@ -7,16 +23,97 @@ from drf_spectacular.utils import (
     OpenApiTypes
 )
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
-from core.models import Recipe, Tag, Ingredient
+from core.metrics import record_image_upload
+from core.models import ImageUpload, Recipe, Tag, Ingredient
+from user.authentication import CachedTokenAuthentication
 from recipe import serializers
+from recipe.cache import (
+    CachedListMixin,
+    make_etag,
+    recipe_stats,
+    request_digest,
+)
+from recipe.exporters import EXPORT_FORMATS
+from recipe.images import enqueue_image, stage_upload
+from recipe.importers import RecipeImporter
+from recipe.pagination import (
+    RecipeCursorPagination,
+    RecipeAttrCursorPagination,
+)
+from recipe.renderers import ORJSONRenderer
+from recipe.renditions import (
+    RENDITION_FORMATS,
+    RENDITION_SIZES,
+    get_rendition,
+)
+from recipe.search import search_recipes, typeahead
+from recipe.uploads import (
+    assemble_upload,
+    parse_content_range,
+    write_chunk,
+)
+from recipe.utils import through_columns
+
+
+# exact decimals keep cursor positions of ranked pages stable
+COVERAGE_FIELD = DecimalField(max_digits=5, decimal_places=4)
+# values of the ordering parameter, id breaks ties in the sort direction
+ORDERINGS = {
+    'newest': ('-id',),
+    'time': ('time_minutes', 'id'),
+    '-time': ('-time_minutes', '-id'),
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+}
+# query parameter, lookup, parser
+RANGE_PARAMS = [
+    ('max_time', 'time_minutes__lte', int),
+    ('min_price', 'price__gte', Decimal),
+    ('max_price', 'price__lte', Decimal),
+]
+# relations expand= may add to a fields= projection
+EXPANDABLE = ['tags', 'ingredients']
+# model columns of serializer fields not named after one
+FIELD_COLUMNS = {
+    'tags': [],
+    'ingredients': [],
+    'images': ['image'],
+}
+TYPEAHEAD_LIMIT = 10
+TYPEAHEAD_MAX_LIMIT = 50
+UUID_PATTERN = (
+    '[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+)
+UPLOAD_ID_PARAMETER = OpenApiParameter(
+    'upload_id', OpenApiTypes.UUID, OpenApiParameter.PATH,
+)
+
+
+PROJECTION_PARAMETERS = [
+    OpenApiParameter(
+        'fields',
+        OpenApiTypes.STR,
+        description=('comma separated fields to return, others are',
+                     ' neither serialized nor loaded'),
+    ),
+    OpenApiParameter(
+        'expand',
+        OpenApiTypes.STR,
+        description=('with fields, comma separated relations to',
+                     ' embed: tags, ingredients'),
+    ),
+]
 
 
 @extend_schema_view(
+    retrieve=extend_schema(parameters=PROJECTION_PARAMETERS),
     list=extend_schema(
         parameters=[
             OpenApiParameter(
@@ -30,46 +127,360 @@ from recipe import serializers
                 OpenApiTypes.STR,
                 description=('comma separated list',
                              ' of ids to filter by ingredient')
-            )
+            ),
+            OpenApiParameter(
+                'search',
+                OpenApiTypes.STR,
+                description=('full text search over title, description,',
+                             ' tag and ingredient names, best matches first'),
+            ),
+            OpenApiParameter(
+                'have',
+                OpenApiTypes.STR,
+                description=('comma separated ingredient ids the user has,',
+                             ' ranks recipes by the fraction they cover'),
+            ),
+            OpenApiParameter(
+                'min_coverage',
+                OpenApiTypes.NUMBER,
+                description=('with have, least covered fraction of a',
+                             ' recipe\'s ingredients, 0 to 1'),
+            ),
+            OpenApiParameter(
+                'max_time',
+                OpenApiTypes.INT,
+                description='longest time_minutes to include',
+            ),
+            OpenApiParameter(
+                'min_price',
+                OpenApiTypes.NUMBER,
+                description='lowest price to include',
+            ),
+            OpenApiParameter(
+                'max_price',
+                OpenApiTypes.NUMBER,
+                description='highest price to include',
+            ),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR, enum=list(ORDERINGS),
+                description=('sort key, overrides the search and coverage',
+                             ' ranking, newest (default) otherwise'),
+            ),
+            *PROJECTION_PARAMETERS,
+            OpenApiParameter(
+                'match',
+                OpenApiTypes.STR, enum=['any', 'all'],
+                description=('any (default) keeps recipes with one of the',
+                             ' requested ids, all requires every id'),
+            ),
         ]
     )
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CachedListMixin, viewsets.ModelViewSet):
     '''view for manage recipe APIs'''
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeCursorPagination
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
+    list_fields = ['id', 'title', 'time_minutes', 'price', 'link', 'image']
+    prefetch_actions = ['list', 'retrieve']
 
-    def _params_to_int(self, qs):
-        '''convert list of strings to integer'''
-        return [int(str_int) for str_int in qs.split(',')]
+    def _params_to_int(self, param):
+        '''convert the comma separated ids of a query param to integers'''
+        try:
+            return [
+                int(str_int)
+                for str_int in self.request.query_params[param].split(',')
+            ]
+        except ValueError:
+            raise ValidationError(
+                {param: 'Enter comma separated integer ids.'}
+            )
 
     def get_queryset(self):
         '''retrieving  recipes for authenticated user'''
         # return self.queryset.filter(user=self.request.user).order_by('-id')
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        match_all = self._match_all()
         queryset = self.queryset
 
         if tags:
-            tag_ids = self._params_to_int(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            tag_ids = self._params_to_int('tags')
+            queryset = self._filter_linked(
+                queryset, Recipe.tags, tag_ids, match_all
+            )
 
         if ingredients:
-            ingredient_ids = self._params_to_int(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            ingredient_ids = self._params_to_int('ingredients')
+            queryset = self._filter_linked(
+                queryset, Recipe.ingredients, ingredient_ids, match_all
+            )
+
+        search = self.request.query_params.get('search')
+        if search:
+            queryset = search_recipes(queryset, search)
+
+        if self.request.query_params.get('have'):
+            queryset = self._rank_by_coverage(
+                queryset, self._params_to_int('have'), self._min_coverage()
+            )
+
+        queryset = queryset.filter(
+            user=self.request.user, **self._range_filters()
+        ).order_by(*self.get_cursor_ordering())
+
+        return self._optimize_queryset(queryset)
+
+    def get_cursor_ordering(self):
+        '''requested sort, else best coverage or search match, else newest'''
+        ordering = self.request.query_params.get('ordering')
+        if ordering:
+            if ordering not in ORDERINGS:
+                raise ValidationError(
+                    {'ordering': f'Choose one of {", ".join(ORDERINGS)}.'}
+                )
+            return ORDERINGS[ordering]
+        if self.request.query_params.get('have'):
+            return ('-coverage', '-id')
+        if self.request.query_params.get('search'):
+            return ('-rank', '-id')
+        return ('-id',)
+
+    def _range_filters(self):
+        '''lookups for the time and price bounds in the query'''
+        filters = {}
+        for param, lookup, parse in RANGE_PARAMS:
+            value = self.request.query_params.get(param)
+            if value is None:
+                continue
+            try:
+                value = parse(value)
+                valid = Decimal(value).is_finite() and value >= 0
+            except (ValueError, InvalidOperation):
+                valid = False
+            if not valid:
+                raise ValidationError(
+                    {param: 'Enter a number greater than or equal to 0.'}
+                )
+            filters[lookup] = value
+        return filters
+
+    def _min_coverage(self):
+        '''least fraction of a recipe's ingredients the user must have'''
+        value = self.request.query_params.get('min_coverage', '0')
+        try:
+            min_coverage = Decimal(value)
+            valid = min_coverage.is_finite() and 0 <= min_coverage <= 1
+        except InvalidOperation:
+            valid = False
+        if not valid:
+            raise ValidationError(
+                {'min_coverage': 'Enter a number between 0 and 1.'}
+            )
+        return min_coverage
+
+    def _rank_by_coverage(self, queryset, have_ids, min_coverage):
+        '''annotate the fraction of ingredients in have_ids, grouped in SQL
+
+        Recipes without any of the ingredients are left out.
+        '''
+        have_count = Count('ingredients', filter=Q(ingredients__in=have_ids))
+        return queryset.annotate(
+            have_count=have_count,
+            coverage=Cast(
+                Cast(have_count, COVERAGE_FIELD) / Count('ingredients'),
+                COVERAGE_FIELD,
+            ),
+        ).filter(have_count__gt=0, coverage__gte=min_coverage)
+
+    def _match_all(self):
+        '''whether recipes must carry every requested tag/ingredient'''
+        match = self.request.query_params.get('match', 'any')
+        if match not in ['any', 'all']:
+            raise ValidationError({'match': 'Choose one of any, all.'})
+        return match == 'all'
+
+    def _filter_linked(self, queryset, descriptor, ids, match_all):
+        '''keep recipes linked to any or all ids, using EXISTS not joins'''
+        source, target = through_columns(descriptor)
+        links = descriptor.through.objects.filter(**{source: OuterRef('pk')})
+        if not match_all:
+            return queryset.filter(
+                Exists(links.filter(**{f'{target}__in': ids}))
+            )
+        # one probe of the (recipe_id, <attr>_id) unique index per id
+        for obj_id in set(ids):
+            queryset = queryset.filter(
+                Exists(links.filter(**{target: obj_id}))
+            )
+        return queryset
+
+    def _related_prefetches(self, fields=None):
+        '''prefetches loading only the serialized tag/ingredient columns'''
+        prefetches = [
+            # in id order, like the lists of RecipeRowsSerializer
+            Prefetch(
+                'tags',
+                queryset=Tag.objects.only('id', 'name').order_by('id'),
+            ),
+            Prefetch(
+                'ingredients',
+                queryset=Ingredient.objects.only('id', 'name').order_by('id'),
+            ),
+        ]
+        if fields is None:
+            return prefetches
+        return [p for p in prefetches if p.prefetch_to in fields]
+
+    def _selected_fields(self):
+        '''fields named by fields= plus relations named by expand=
+
+        None when the client did not ask for a projection.
+        '''
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+        available = self.get_serializer_class().Meta.fields
+        selected = fields.split(',')
+        expand = self.request.query_params.get('expand')
+        for param, names, allowed in [
+            ('fields', selected, available),
+            ('expand', expand.split(',') if expand else [], EXPANDABLE),
+        ]:
+            unknown = [name for name in names if name not in allowed]
+            if unknown:
+                raise ValidationError({param: (
+                    f'Unknown field(s) {", ".join(unknown)}, choose from '
+                    f'{", ".join(allowed)}.'
+                )})
+            selected += names
+        return [name for name in available if name in selected]
+
+    def _projected_columns(self, fields):
+        '''model columns the fields and the current ordering read'''
+        columns = ['id']
+        for name in fields:
+            columns += FIELD_COLUMNS.get(name, [name])
+        concrete = {field.name for field in Recipe._meta.concrete_fields}
+        columns += [
+            key.lstrip('-') for key in self.get_cursor_ordering()
+            if key.lstrip('-') in concrete
+        ]
+        if self.action == 'retrieve':
+            # validators of the response
+            columns.append('updated_at')
+        return columns
+
+    def _row_columns(self, fields):
+        '''columns of the rows lists and exports are serialized from'''
+        if fields is None:
+            columns = list(self.list_fields)
+        else:
+            columns = self._projected_columns(fields)
+        # the cursor reads the ordering keys, annotations included, off rows
+        columns += [key.lstrip('-') for key in self.get_cursor_ordering()]
+        return list(dict.fromkeys(columns))
+
+    def _optimize_queryset(self, queryset):
+        '''load only what the current action serializes'''
+        fields = None
+        if self.action in self.prefetch_actions:
+            fields = self._selected_fields()
+        if self.action in ['list', 'export']:
+            # plain rows for RecipeRowsSerializer, which loads relations
+            return queryset.values(*self._row_columns(fields))
+        if fields is not None:
+            queryset = queryset.only(*self._projected_columns(fields))
+        if self.action in self.prefetch_actions:
+            queryset = queryset.prefetch_related(
+                *self._related_prefetches(fields)
+            )
+        return queryset
 
-        return queryset.filter(
-            user=self.request.user,
-        ).order_by('-id').distinct()
+    def get_serializer(self, *args, **kwargs):
+        '''trim responses to the requested fields, serialize lists from rows'''
+        if self.action in self.prefetch_actions:
+            kwargs.setdefault('fields', self._selected_fields())
+        if self.action == 'list' and kwargs.pop('many', False):
+            kwargs.setdefault('context', self.get_serializer_context())
+            return serializers.RecipeRowsSerializer(*args, **kwargs)
+        return super().get_serializer(*args, **kwargs)
+
+    def _is_conditional(self, request):
+        return ('HTTP_IF_NONE_MATCH' in request.META or
+                'HTTP_IF_MODIFIED_SINCE' in request.META)
+
+    def _with_validators(self, response, etag, last_modified=None):
+        '''attach validators so clients revalidate instead of refetching'''
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def _list_etag(self, request):
+        '''ETag of a list from the request and the user's recipe stats
+
+        Any change to the user's recipes moves their newest update or
+        their count, so the filtered queryset is never aggregated.
+        '''
+        stats = recipe_stats(request.user.id)
+        return make_etag(
+            request_digest(request), stats['last_update'], stats['total']
+        )
+
+    def list(self, request, *args, **kwargs):
+        '''list recipes, or 304 when the client copy is current'''
+        etag = self._list_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        return self._with_validators(response, etag)
+
+    def retrieve(self, request, *args, **kwargs):
+        '''retrieve a recipe, or 304 when the client copy is current'''
+        if self._is_conditional(request):
+            updated_at = get_object_or_404(
+                Recipe.objects.filter(user=request.user)
+                .values_list('updated_at', flat=True),
+                pk=kwargs['pk'],
+            )
+            etag = make_etag(
+                kwargs['pk'], updated_at, self._selected_fields()
+            )
+            response = get_conditional_response(
+                request,
+                etag=etag,
+                last_modified=int(updated_at.timestamp()),
+            )
+            if response is not None:
+                return self._with_validators(response, etag, updated_at)
+
+        instance = self.get_object()
+        response = Response(self.get_serializer(instance).data)
+        return self._with_validators(
+            response,
+            make_etag(
+                str(instance.pk), instance.updated_at,
+                self._selected_fields(),
+            ),
+            instance.updated_at,
+        )
 
     def get_serializer_class(self):
         '''return serializer class for request'''
         if self.action == 'list':
             return serializers.RecipeSerializer
-        elif self.action == 'upload_image':
+        elif self.action in ['upload_image', 'finalize_upload']:
             return serializers.RecipeImageSerializer
+        elif self.action in ['start_upload', 'upload_chunk']:
+            return serializers.ImageUploadSerializer
+        elif self.action == 'bulk':
+            return serializers.RecipeImportSerializer
 
         return self.serializer_class
 
@@ -79,14 +490,153 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        '''upload an image to recipe'''
+        '''stage an image for the recipe and process it in the background'''
         recipe = self.get_object()
         serializer = self.get_serializer(recipe, data=request.data)
         if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            image = serializer.validated_data['image']
+            record_image_upload('direct', image.size)
+            staged_name = stage_upload(image)
+            enqueue_image(recipe, staged_name)
+            return Response(
+                self.get_serializer(recipe).data,
+                status=status.HTTP_202_ACCEPTED,
+            )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def _get_upload(self, upload_id):
+        '''return an upload of the requested recipe'''
+        return get_object_or_404(
+            ImageUpload.objects.select_related('recipe'),
+            recipe=self.get_object(), pk=upload_id,
+        )
+
+    @action(methods=['POST'], detail=True, url_path='uploads',
+            url_name='uploads')
+    def start_upload(self, request, pk=None):
+        '''start a resumable upload of the recipe image'''
+        recipe = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(recipe=recipe)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @extend_schema(
+        methods=['PUT'],
+        parameters=[UPLOAD_ID_PARAMETER],
+        request={'application/octet-stream': OpenApiTypes.BINARY},
+    )
+    @extend_schema(methods=['GET'], parameters=[UPLOAD_ID_PARAMETER])
+    @action(methods=['GET', 'PUT'], detail=True,
+            url_path=f'uploads/(?P<upload_id>{UUID_PATTERN})',
+            url_name='upload')
+    def upload_chunk(self, request, pk=None, upload_id=None):
+        '''report upload progress, or store the Content-Range of the body'''
+        upload = self._get_upload(upload_id)
+        if request.method == 'PUT':
+            start, end = parse_content_range(
+                request.META.get('HTTP_CONTENT_RANGE'), upload.size
+            )
+            if request.stream is None:
+                raise ValidationError({'detail': 'Request body is empty.'})
+            write_chunk(upload, start, end, request.stream)
+        return Response(self.get_serializer(upload).data)
+
+    @extend_schema(parameters=[UPLOAD_ID_PARAMETER], request=None)
+    @action(methods=['POST'], detail=True,
+            url_path=f'uploads/(?P<upload_id>{UUID_PATTERN})/finalize',
+            url_name='upload-finalize')
+    def finalize_upload(self, request, pk=None, upload_id=None):
+        '''assemble a complete upload and process it like upload_image'''
+        upload = self._get_upload(upload_id)
+        recipe = upload.recipe
+        filename = upload.filename
+        staged_name = assemble_upload(upload)
+        with default_storage.open(staged_name, 'rb') as f:
+            serializer = self.get_serializer(
+                recipe, data={'image': File(f, name=filename)}
+            )
+            valid = serializer.is_valid()
+        if not valid:
+            default_storage.delete(staged_name)
+            return Response(
+                serializer.errors, status=status.HTTP_400_BAD_REQUEST
+            )
+        record_image_upload('resumable', upload.size)
+        enqueue_image(recipe, staged_name)
+        return Response(
+            self.get_serializer(recipe).data,
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'size', OpenApiTypes.INT, OpenApiParameter.PATH,
+                enum=sorted(RENDITION_SIZES),
+                description='longest side of the rendition in pixels',
+            ),
+            OpenApiParameter(
+                'fmt', OpenApiTypes.STR, OpenApiParameter.PATH,
+                enum=RENDITION_FORMATS,
+            ),
+        ],
+        responses={302: None},
+    )
+    @action(
+        methods=['GET'], detail=True, url_name='rendition',
+        url_path=r'images/(?P<size>\d+)/(?P<fmt>[a-z]+)',
+    )
+    def rendition(self, request, pk=None, size=None, fmt=None):
+        '''redirect to a resized image, generating it on first request'''
+        size = int(size)
+        if size not in RENDITION_SIZES or fmt not in RENDITION_FORMATS:
+            raise Http404
+        recipe = self.get_object()
+        if not recipe.image:
+            raise Http404
+        name = get_rendition(recipe.image.name, size, fmt)
+        return HttpResponseRedirect(default_storage.url(name))
+
+    @extend_schema(
+        request={'application/x-ndjson': OpenApiTypes.STR},
+        responses={200: OpenApiTypes.OBJECT},
+    )
+    @action(methods=['POST'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        '''import recipes from a JSON Lines body, one recipe per line'''
+        lines = request.stream if request.stream is not None else []
+        report = RecipeImporter(request.user).run(lines)
+        return Response(report, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'export_format',
+                OpenApiTypes.STR, enum=sorted(EXPORT_FORMATS),
+                description='ndjson (default) or csv',
+            )
+        ],
+        responses={200: OpenApiTypes.BINARY},
+    )
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        '''stream all recipes of the user as NDJSON or CSV'''
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError(
+                {'export_format': f'Choose one of {sorted(EXPORT_FORMATS)}.'}
+            )
+        stream, content_type = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(
+            stream(self.get_queryset()),
+            content_type=content_type,
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{export_format}"'
+        )
+        return response
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -95,29 +645,90 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 'assigned_only',
                 OpenApiTypes.INT, enum=[0, 1],
                 description='Filter by items by assigned recipes',
-            )
+            ),
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                description=('typeahead: names starting with or resembling',
+                             ' q, best matches first, never paginated'),
+            ),
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description=(f'most typeahead results, {TYPEAHEAD_LIMIT}',
+                             f' by default, at most {TYPEAHEAD_MAX_LIMIT}'),
+            ),
+            OpenApiParameter(
+                'compact',
+                OpenApiTypes.INT, enum=[0, 1],
+                description='return [id, name] pairs instead of objects',
+            ),
         ]
     )
 )
 class BaseRecipeAttrViewset(
+        CachedListMixin,
         mixins.UpdateModelMixin,
         mixins.ListModelMixin,
         viewsets.GenericViewSet,
         mixins.DestroyModelMixin):
     '''base viewset for recipe attributes'''
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = RecipeAttrCursorPagination
+
+    def perform_update(self, serializer):
+        '''save the item, rejecting names the user already has'''
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError({'name': ['This name already exists.']})
 
     def get_queryset(self):
-        assigned_only = bool(
-            int(self.request.query_params.get('assigned_only', 0))
-        )
         queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-name').distinct()
+        if self._flag('assigned_only'):
+            descriptor = getattr(Recipe, self.recipe_relation)
+            _, target = through_columns(descriptor)
+            queryset = queryset.filter(Exists(
+                descriptor.through.objects.filter(
+                    **{target: OuterRef('pk')}
+                )
+            ))
+        queryset = queryset.filter(user=self.request.user)
+        q = self.request.query_params.get('q')
+        if q:
+            return typeahead(queryset, q)[:self._typeahead_limit()]
+        return queryset.order_by('-name')
+
+    def _flag(self, param):
+        '''boolean query param given as 0 or 1'''
+        value = self.request.query_params.get(param, 0)
+        try:
+            return bool(int(value))
+        except ValueError:
+            raise ValidationError({param: 'A valid integer is required.'})
+
+    def _typeahead_limit(self):
+        '''requested number of typeahead results, capped'''
+        limit = self.request.query_params.get('limit', TYPEAHEAD_LIMIT)
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValidationError({'limit': 'A valid integer is required.'})
+        return max(1, min(limit, TYPEAHEAD_MAX_LIMIT))
+
+    def paginate_queryset(self, queryset):
+        '''typeahead results are already limited, never page them'''
+        if self.request.query_params.get('q'):
+            return None
+        return super().paginate_queryset(queryset)
+
+    def get_serializer_class(self):
+        '''return the tiny [id, name] serializer for compact lists'''
+        if self.action == 'list' and self._flag('compact'):
+            return serializers.CompactAttrSerializer
+        return self.serializer_class
 
 
 class TagViewset(
@@ -125,6 +736,7 @@ class TagViewset(
     '''manage tags in database'''
     serializer_class = serializers.TagSerializer
     queryset = Tag.objects.all()
+    recipe_relation = 'tags'
 
 
 class IngredientViewSet(
@@ -133,3 +745,4 @@ class IngredientViewSet(
 
     serializer_class = serializers.IngredientSerializer
     queryset = Ingredient.objects.all()
+    recipe_relation = 'ingredients'
@@ -0,0 +1,107 @@
+'''token authentication backed by an in-process cache'''
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+from core.metrics import record_cache_lookup
+
+
+class TokenCache:
+    '''bounded LRU mapping token keys to users, entries expire after ttl'''
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def set(self, key, user):
+        with self._lock:
+            self._entries[key] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            for key in [key for key, (user, _) in self._entries.items()
+                        if user.pk == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(
+    maxsize=settings.TOKEN_AUTH_CACHE_SIZE,
+    ttl=settings.TOKEN_AUTH_CACHE_TTL,
+)
+
+
+def _shared_key(key):
+    return f'auth:token:{key}'
+
+
+def invalidate_token(key):
+    '''forget a cached token in this process and the shared cache'''
+    token_cache.delete(key)
+    if settings.TOKEN_AUTH_SHARED_CACHE:
+        cache.delete(_shared_key(key))
+
+
+def invalidate_user_tokens(user, keys=()):
+    '''forget every cached token of a user'''
+    token_cache.delete_user(user.pk)
+    if settings.TOKEN_AUTH_SHARED_CACHE:
+        cache.delete_many([_shared_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    '''token authentication skipping the token query for recent keys
+
+    Other worker processes drop their copies when TOKEN_AUTH_CACHE_TTL
+    expires, so that setting bounds how long a revoked token or a
+    deactivated user can keep working there.
+    '''
+
+    def authenticate_credentials(self, key):
+        user = token_cache.get(key)
+        record_cache_lookup('token', user is not None)
+        if user is None and settings.TOKEN_AUTH_SHARED_CACHE:
+            user = cache.get(_shared_key(key))
+            record_cache_lookup('token_shared', user is not None)
+            if user is not None:
+                token_cache.set(key, user)
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user)
+            if settings.TOKEN_AUTH_SHARED_CACHE:
+                cache.set(
+                    _shared_key(key), user, settings.TOKEN_AUTH_CACHE_TTL
+                )
+        # hand out a copy so views mutating request.user never touch
+        # the instance shared with other requests
+        user = copy.copy(user)
+        return (user, self.get_model()(key=key, user=user))
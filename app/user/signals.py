@@ -0,0 +1,23 @@
+'''signal handlers dropping cached authentication'''
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.authentication import invalidate_token, invalidate_user_tokens
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    '''stop accepting a token as soon as it is deleted'''
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def forget_changed_user(sender, instance, created, **kwargs):
+    '''drop cached copies of a user that was deactivated or changed'''
+    if not created:
+        keys = Token.objects.filter(user=instance).values_list(
+            'key', flat=True
+        )
+        invalidate_user_tokens(instance, keys)
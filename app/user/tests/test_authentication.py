@@ -0,0 +1,157 @@
+'''Tests for cached token authentication'''
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import TokenCache, token_cache
+
+ME_URL = reverse('user:me')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class TokenCacheTests(TestCase):
+    '''Test the bounded token cache'''
+
+    def test_least_recently_used_evicted(self):
+        cache = TokenCache(maxsize=2, ttl=60)
+        cache.set('a', 'user a')
+        cache.set('b', 'user b')
+        cache.get('a')
+        cache.set('c', 'user c')
+
+        self.assertEqual(cache.get('a'), 'user a')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 'user c')
+
+    @patch('user.authentication.time.monotonic')
+    def test_entries_expire(self, patched_monotonic):
+        patched_monotonic.return_value = 100
+        cache = TokenCache(maxsize=2, ttl=60)
+        cache.set('a', 'user a')
+
+        patched_monotonic.return_value = 159
+        self.assertEqual(cache.get('a'), 'user a')
+        patched_monotonic.return_value = 160
+        self.assertIsNone(cache.get('a'))
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    '''Test token lookups are cached and invalidated'''
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpassword123',
+            name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeated_requests_skip_token_query(self):
+        '''test only the first request looks the token up'''
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_cache_shared_by_recipe_views(self):
+        '''test recipe endpoints reuse the cached token'''
+        self.client.get(ME_URL)
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for query in ctx.captured_queries:
+            self.assertNotIn('authtoken_token', query['sql'])
+
+    def test_invalid_token_rejected(self):
+        '''test unknown keys are still rejected'''
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_rejected(self):
+        '''test deleting a token stops it working immediately'''
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        '''test deactivating a user stops their cached token working'''
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_update_of_user_deactivated_elsewhere_rejected(self):
+        '''test a stale cached user is not saved back over the database'''
+        self.client.get(ME_URL)
+        # another process, whose invalidation never reaches this cache
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_active=False, password='changed elsewhere'
+        )
+
+        res = self.client.patch(ME_URL, {'name': 'New Name'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertEqual(self.user.password, 'changed elsewhere')
+        self.assertEqual(self.user.name, 'Test Name')
+
+    def test_password_change_drops_cached_user(self):
+        '''test changing the password through the api refreshes the cache'''
+        self.client.get(ME_URL)
+
+        res = self.client.patch(ME_URL, {'password': 'newPassword123'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(1):
+            self.client.get(ME_URL)
+
+    def test_profile_update_visible_on_next_request(self):
+        '''test cached users are refreshed after an update'''
+        self.client.get(ME_URL)
+        self.client.patch(ME_URL, {'name': 'New Name'})
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'New Name')
+
+    @override_settings(TOKEN_AUTH_SHARED_CACHE=True)
+    def test_shared_cache_used_when_process_cache_empty(self):
+        '''test another process can reuse the shared cache entry'''
+        self.client.get(ME_URL)
+        token_cache.clear()
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.token.delete()
+        token_cache.clear()
+        res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
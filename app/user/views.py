@@ -1,9 +1,11 @@
 '''Views for the user APiI'''
 
-from rest_framework import generics, authentication, permissions, exceptions
+from django.contrib.auth import get_user_model
+from rest_framework import generics, permissions, exceptions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from user.authentication import CachedTokenAuthentication
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
@@ -34,15 +36,25 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     '''manage authenticated user'''
 
     serializer_class = UserSerializer
-    authentication_class = [authentication.TokenAuthentication, ]
+    authentication_classes = [CachedTokenAuthentication, ]
     permission_classes = [IsAuthenticatedOrNot, ]
 
     def get_object(self):
         '''Retrieve and return the authenticated user'''
-        if self.request.user.is_authenticated:
-            return self.request.user
-        else:
+        if not self.request.user.is_authenticated:
             return None
+        if self.request.method in permissions.SAFE_METHODS:
+            return self.request.user
+        # the cached user may be stale, never save it back over changes
+        # made elsewhere, such as a deactivation or a new password
+        user = get_user_model().objects.filter(
+            pk=self.request.user.pk, is_active=True
+        ).first()
+        if user is None:
+            raise exceptions.AuthenticationFailed(
+                'User inactive or deleted.'
+            )
+        return user
 
     def check_permissions(self, request):
         """